@@ -52,6 +52,17 @@ def tostring(val, nbits):
         res = bin(val)[:2] + bin(val)[3:]
     return res
 
+### tracing ###
+## a round observer is any callable observer(rnd, stage, state, key=None); the
+## cipher calls it for every stage of every round, the round loop checks for an
+## observer first, so without one nothing is formatted or printed at all
+def print_trace(rnd, stage, state, key=None):
+    ## observer printing the round trace to stdout
+    if key is not None:
+        print(f"R{rnd} {stage} (key = {key:012x}):\t{state:x}")
+    else:
+        print(f"R{rnd} {stage}:\t{state:x}")
+
 class InitialPermutation():
     def __init__(self):
         self._blocksize = 64
@@ -426,9 +437,16 @@ class FFunction():
         return binlst
 
 class DES():
-    def __init__(self, inputkey):
+    def __init__(self, inputkey, observer=None):
         self.ip = InitialPermutation()
         self.ffunc = FFunction(inputkey)
+        ## round observer, see print_trace(); by default the round trace is
+        ## printed only when DBG_OUTPUT is set
+        self.set_observer(observer if observer is not None else (print_trace if DBG_OUTPUT else None))
+
+    def set_observer(self, observer):
+        ## registers a round observer, or removes it by passing None
+        self._observer = observer
 
     @staticmethod
     def _tablelookup(table, index, offset=0):
@@ -514,41 +532,34 @@ class DES():
         ## plaintext = the plaintext as string or as hex number
         ## ishex = if the plaintext was a hex number (True)
 
+        observer = self._observer
+
         ## 1. initial permutation
         ## Note that both permutations do not increase the security of DES at all
         ## takes 64-bit input, result is
         state = DES._map_by_table(state, self.ip.initial_permutation, 64)
-        DBG("1. initial permutation")
-        DBG("    %s"%(tostring(state, 64)))
+        if observer is not None: observer(0, "initial permutation", state)
 
         ## F-function
         for idx in range(16):
             ## DES loops the following steps
             ## 2. split
             left_half, right_half = self.ffunc.split(state)
-            DBG("2. split")
-            DBG("    %s %s"%(tostring(left_half, 32), tostring(right_half, 32)))
 
             ## 3. expansion permutation
             right_exp = self.ffunc.expansion(right_half)
-            DBG("3. expansion permutation")
-            DBG("    %s %s"%(tostring(left_half, 32), tostring(right_half, 32)))
-            DBG("             | %s - expanded right half"%(tostring(right_exp, 48)))
-            if isencrypt: DBG("             | %s - roundkey[%d]"%(tostring(self.ffunc.keyschedule.encryptkeys[idx], 48), idx))
-            else: DBG("             | %s - roundkey[%d]"%(tostring(self.ffunc.keyschedule.decryptkeys[idx], 48), idx))
+            if observer is not None: observer(idx, "expansion permutation", right_exp)
 
             ## 4. apply key
             if isencrypt: right_exp = self.ffunc.encryptkey(right_exp,idx)
             else: right_exp = self.ffunc.decryptkey(right_exp,idx)
-            DBG("4. key")
-            DBG("    %s %s"%(tostring(left_half, 32), tostring(right_half, 32)))
-            DBG("             | %s"%(tostring(right_exp, 48)))
+            if observer is not None:
+                if isencrypt: observer(idx, "key", right_exp, self.ffunc.keyschedule.encryptkeys[idx])
+                else: observer(idx, "key", right_exp, self.ffunc.keyschedule.decryptkeys[idx])
 
             ## 5. s-boxes
             right_exp = self.ffunc.sbox(right_exp)
-            DBG("5. s-box")
-            DBG("    %s %s"%(tostring(left_half, 32), tostring(right_half, 32)))
-            DBG("             | %s"%(tostring(right_exp, 32)))
+            if observer is not None: observer(idx, "s-box", right_exp)
 
             ## 6. permutation
             ## finally, the 32-bit output is permuted bitwise according to the
@@ -558,37 +569,27 @@ class DES():
             ## different S-boxes in the following round
             ## takes a 32-bit input, result is 32-bit
             right_exp = self._map_by_table(right_exp, self.ffunc.pbox, 32)
-            DBG("6. permutation")
-            DBG("    %s %s"%(tostring(left_half, 32), tostring(right_half, 32)))
-            DBG("             | %s"%(tostring(right_exp, 32)))
+            if observer is not None: observer(idx, "permutation", right_exp)
 
             ## 7. xor left and right half
             left_half ^= right_exp
-            DBG("7. xor left half")
-            DBG("    %s %s"%(tostring(left_half, 32), tostring(right_half, 32)))
 
             ## 8. merge and switch halves
             state = DES._append(right_half, left_half, 32)
-            DBG("8. merge and switch halves")
-            DBG("    %s"%(tostring(state, 64)))
-            DBG("")
+            if observer is not None: observer(idx, "merge and switch halves", state)
 
         ## DES loops the following steps
         ## final split
         left_half, right_half = self.ffunc.split(state)
-        DBG("final split")
-        DBG("    %s %s"%(tostring(left_half, 32), tostring(right_half, 32)))
 
         ## final merge and switch halves
         state = DES._append(right_half, left_half, 32)
-        DBG("final switch halves")
-        DBG("    %s"%(tostring(state, 64)))
+        if observer is not None: observer(16, "final switch halves", state)
 
         ## revert permutation
         ## Note that both permutations do not increase the security of DES at all
         state = DES._map_by_table(state, self.ip.final_permutation, 64)
-        DBG("9. final permutation")
-        DBG("    %s"%(tostring(state, 64)))
+        if observer is not None: observer(16, "final permutation", state)
 
         return state
 
@@ -666,4 +667,4 @@ def main(argv=sys.argv[1:]):
 ### start ###
 if __name__ == '__main__':
     main()
-print("READY.")
+    print("READY.")
@@ -27,8 +27,19 @@ def die(msg):
     if 0 < len(msg): print(msg)
     sys.exit(1)
 
+### tracing ###
+## a round observer is any callable observer(rnd, stage, state, key=None); the
+## cipher calls it for every stage of every round, the round loop checks for an
+## observer first, so without one nothing is formatted or printed at all
+def print_trace(rnd, stage, state, key=None):
+    ## observer printing the round trace to stdout
+    if key is not None:
+        print(f"R{rnd} {stage} (key = {key:016x}):\t{state:016x}")
+    else:
+        print(f"R{rnd} {stage}:\t{state:016x}")
+
 class Present:
-    def __init__(self, inputkey):
+    def __init__(self, inputkey, observer=None):
         self._sbox = [0xc,0x5,0x6,0xb,0x9,0x0,0xa,0xd,0x3,0xe,0xf,0x8,0x4,0x7,0x1,0x2]
         self._sbox_inv = [self._sbox.index(i) for i in range(len(self._sbox))]  ## python3
 
@@ -43,6 +54,13 @@ class Present:
 
         self._generateRoundkeys80(inputkey)
 
+        ## round observer, see print_trace()
+        self.set_observer(observer)
+
+    def set_observer(self, observer):
+        ## registers a round observer, or removes it by passing None
+        self._observer = observer
+
     ## utilities
     def _checklength(self, text, length):
         if length != len(text):
@@ -116,30 +134,46 @@ class Present:
         return self._sbox[bin2dec("".join(map(str,fourbit)))]
 
     ## public interface
-    def encrypt(self, plaintext):
+    def encrypt(self, plaintext, ishex=False):
         ## takes plaintext as string - just demonstrated with one block, to
-        ## avoid padding issues
+        ## avoid padding issues - or as 64-bit number (ishex), output will be
+        ## hex
         ##
         ## string to number
         ## python3 string to hex :int formatting by means of binascii package
-        import binascii
-        state = int(binascii.hexlify(bytes(plaintext,"iso_8859_1")), 16) &0xffffffffffffffff  ## python3
+        if ishex:
+            state = plaintext
+        else:
+            import binascii
+            state = int(binascii.hexlify(bytes(plaintext,"iso_8859_1")), 16) &0xffffffffffffffff  ## python3
 
+        observer = self._observer
         for idx in range(31-1):
             state = self._addRoundKey(state, self._roundkeys[idx])
+            if observer is not None: observer(idx, "add round key", state, self._roundkeys[idx])
             state = self._sBoxLayer(state)
+            if observer is not None: observer(idx, "s-box layer", state)
             state = self._pLayer(state)
+            if observer is not None: observer(idx, "p-layer", state)
         ## last key
         state = self._addRoundKey(state, self._roundkeys[-1])
+        if observer is not None: observer(30, "add round key", state, self._roundkeys[-1])
         return state
 
-    def decrypt(self, ciphertext):
+    def decrypt(self, ciphertext, asnum=False):
+        ## input is in hex, output will be string, or the 64-bit number (asnum)
         state = ciphertext
+        observer = self._observer
         for idx in range(31-1):
             state = self._addRoundKey(state, self._roundkeys[-idx-1])
+            if observer is not None: observer(30-idx, "add round key", state, self._roundkeys[-idx-1])
             state = self._pLayer_dec(state)
+            if observer is not None: observer(30-idx, "p-layer", state)
             state = self._sBoxLayer_dec(state)
+            if observer is not None: observer(30-idx, "s-box layer", state)
         state = self._addRoundKey(state, self._roundkeys[0])
+        if observer is not None: observer(0, "add round key", state, self._roundkeys[0])
+        if asnum: return state
 
         ## conversion to string, simply prepends '0' in case of smaller blocks
         data = "%.16x" % (state)
@@ -201,4 +235,4 @@ def main():
 ### start ###
 if __name__ == '__main__':
     main()
-print("READY.")
+    print("READY.")
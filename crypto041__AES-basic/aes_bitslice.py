@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# IMPORTANT: this implementation is meant as an educational demonstration only
+"""
+@author: Lothar Rubusch
+@email: L.Rubusch@gmx.ch
+@license: GPLv3
+
+bitsliced AES over python integers
+
+N blocks are transposed into 128 bit slices: slice (p, b) is a number of N
+bits, where bit k is bit b of byte p of block k; every logical operation on
+slices then processes all N blocks at once, python integers having arbitrary
+width
+
+ - AddRoundKey: a slice is inverted, where the round key bit is set
+ - ShiftRows: reorders the bytes, i.e. just lists of slices, no operation
+ - MixColumns: linear, multiplication by 2 moves and XORs slices
+ - SubBytes: the S-box can not be a table lookup anymore, it is evaluated as
+   Boolean circuit, the inverse in GF(2^8) followed by the affine transform;
+   the inverse is computed as x^254 = x^-1, by four multiplications and
+   squarings (which are linear in GF(2^8))
+
+        x^2, x^3 = x^2 * x, x^12 = (x^3)^4, x^15 = x^12 * x^3,
+        x^240 = (x^15)^16, x^252 = x^240 * x^12, x^254 = x^252 * x^2
+
+the circuit costs the same for 1 or for thousands of blocks, thus the engine
+pays off only for larger batches, i.e. ECB and CTR; main() measures where
+it overtakes the per-block T-table engine
+
+the key schedule is taken from an AES instance (aes_core.py), which provides
+the round key words in _keys
+
+
+AES example
+
+Key:        000102030405060708090a0b0c0d0e0f
+Plaintext:  00112233445566778899aabbccddeeff
+Ciphertext: 69c4e0d86a7b0430d8cdb78070b4c55a
+"""
+
+import sys, time
+
+from aes_core import AES, die
+
+## per bit b, a translation table mapping a byte to the ASCII digit of its
+## bit b, to transpose the bytes by bytes.translate() and int(..., 2)
+_BIT_TO_ASCII = [bytes(0x31 if (val >>b) & 0x1 else 0x30 for val in range(256)) for b in range(8)]
+
+## per bit b, a translation table mapping the ASCII digits back to the bit b
+_ASCII_TO_BIT = [bytes((1 <<b) if 0x31 == val else 0 for val in range(256)) for b in range(8)]
+
+
+### GF(2^8) on slices ###
+
+def _gf_linear_map(func):
+    ## the matrix of a linear map in GF(2^8), e.g. squaring, as list of the
+    ## input bits per output bit
+    ##
+    ## params:
+    ## func = the linear map on byte values
+    images = [func(1 <<b) for b in range(8)]
+    return [[b for b in range(8) if (images[b] >>out) & 0x1] for out in range(8)]
+
+def _gf_mult_bytes(vala, valb):
+    ## multiplication in GF(2^8) mod P(x) on byte values, only needed to build
+    ## the linear maps
+    res = 0
+    while valb:
+        if valb & 0x1: res ^= vala
+        vala <<= 1
+        if vala & 0x100: vala ^= 0x11b
+        valb >>= 1
+    return res
+
+def _gf_power_bytes(val, exp):
+    res = 1
+    for idx in range(exp): res = _gf_mult_bytes(res, val)
+    return res
+
+_SQUARE = _gf_linear_map(lambda val: _gf_power_bytes(val, 2))
+_POW4 = _gf_linear_map(lambda val: _gf_power_bytes(val, 4))
+_POW16 = _gf_linear_map(lambda val: _gf_power_bytes(val, 16))
+
+
+class AESBitslice:
+    def __init__(self, aes):
+        ## params:
+        ## aes = an AES instance, providing the round key words (_keys) and
+        ##       the number of rounds (_rounds)
+        self._rounds = aes._rounds
+        words = aes._keys
+        ## per round, per byte p, the bits b set in the round key
+        self._roundkey_bits = []
+        for rnd in range(self._rounds+1):
+            key = words[rnd*4] <<96 | words[rnd*4+1] <<64 | words[rnd*4+2] <<32 | words[rnd*4+3]
+            keybytes = key.to_bytes(16, "big")
+            self._roundkey_bits.append([[b for b in range(8) if (keybytes[p] >>b) & 0x1] for p in range(16)])
+
+        ## ShiftRows as in aes_core.py, state[p] = state[shift_rows[p]]
+        self._shift_rows = aes._shift_rows
+
+    ## transposition
+
+    def _to_slices(self, data, nblocks):
+        ## params:
+        ## data = the blocks as bytes, 16 bytes per block
+        ## nblocks = number of blocks
+        ##
+        ## returns the state as list of 16 bytes, each a list of 8 slices
+        state = []
+        for p in range(16):
+            column = data[p::16]
+            ## reversed, the digit of block 0 is the least significant bit
+            state.append([int(column.translate(_BIT_TO_ASCII[b])[::-1], 2) for b in range(8)])
+        return state
+
+    def _from_slices(self, state, nblocks):
+        ## the inverse of _to_slices()
+        res = bytearray(16 * nblocks)
+        for p in range(16):
+            column = 0
+            for b in range(8):
+                digits = format(state[p][b], "0%db"%nblocks)[::-1].encode("ascii")
+                column |= int.from_bytes(digits.translate(_ASCII_TO_BIT[b]), "little")
+            res[p::16] = column.to_bytes(nblocks, "little")
+        return bytes(res)
+
+    ## layers
+
+    def _add_round_key(self, state, rnd, ones):
+        for p, bits in enumerate(self._roundkey_bits[rnd]):
+            byte = state[p]
+            for b in bits: byte[b] ^= ones
+
+    def _linear(self, byte, matrix):
+        ## applies a linear map of GF(2^8), see _gf_linear_map()
+        res = []
+        for row in matrix:
+            val = 0
+            for b in row: val ^= byte[b]
+            res.append(val)
+        return res
+
+    def _gf_mult(self, vala, valb):
+        ## multiplication in GF(2^8) mod P(x) on slices, the schoolbook
+        ## product followed by the reduction of x^8 = x^4 + x^3 + x + 1
+        prod = [0] * 15
+        for i in range(8):
+            ai = vala[i]
+            for j in range(8):
+                prod[i+j] ^= ai & valb[j]
+        for k in range(14, 7, -1):
+            val = prod[k]
+            prod[k-4] ^= val
+            prod[k-5] ^= val
+            prod[k-7] ^= val
+            prod[k-8] ^= val
+        return prod[:8]
+
+    def _sub_byte(self, byte, ones):
+        ## the S-box as circuit, the inverse by x^254 (0 maps to 0), then the
+        ## affine transform s[i] = b[i] ^ b[i+4] ^ b[i+5] ^ b[i+6] ^ b[i+7] ^ c[i]
+        ## with c = 0x63
+        x2 = self._linear(byte, _SQUARE)
+        x3 = self._gf_mult(x2, byte)
+        x12 = self._linear(x3, _POW4)
+        x15 = self._gf_mult(x12, x3)
+        x240 = self._linear(x15, _POW16)
+        x252 = self._gf_mult(x240, x12)
+        inv = self._gf_mult(x252, x2)
+        res = []
+        for i in range(8):
+            val = inv[i] ^ inv[(i+4) % 8] ^ inv[(i+5) % 8] ^ inv[(i+6) % 8] ^ inv[(i+7) % 8]
+            if (0x63 >>i) & 0x1: val ^= ones
+            res.append(val)
+        return res
+
+    def _xtime(self, byte):
+        ## multiplication by 2, a shift with the reduction by P(x)
+        return [byte[7], byte[0] ^ byte[7], byte[1], byte[2] ^ byte[7],
+                byte[3] ^ byte[7], byte[4], byte[5], byte[6]]
+
+    def _mix_column(self, state):
+        ## per column (a0, a1, a2, a3):
+        ## c[r] = 2*a[r] + 3*a[r+1] + a[r+2] + a[r+3]
+        ##      = 2*(a[r] + a[r+1]) + a[r+1] + a[r+2] + a[r+3]
+        res = []
+        for col in range(0, 16, 4):
+            column = state[col:col+4]
+            for row in range(4):
+                a0, a1, a2, a3 = column[row], column[(row+1) % 4], column[(row+2) % 4], column[(row+3) % 4]
+                double = self._xtime([a0[b] ^ a1[b] for b in range(8)])
+                res.append([double[b] ^ a1[b] ^ a2[b] ^ a3[b] for b in range(8)])
+        return res
+
+    ## public interface
+
+    def encrypt_bytes(self, data):
+        ## params:
+        ## data = the plaintext blocks as bytes, a multiple of 16 bytes long
+        ##
+        ## returns the ciphertext blocks as bytes
+        if 0 != len(data) % 16: die("bitsliced AES needs a multiple of the blocksize")
+        nblocks = len(data) // 16
+        if 0 == nblocks: return b""
+        ones = (1 <<nblocks) - 1
+
+        state = self._to_slices(data, nblocks)
+        self._add_round_key(state, 0, ones)
+        for rnd in range(1, self._rounds+1):
+            state = [self._sub_byte(byte, ones) for byte in state]
+            state = [state[idx] for idx in self._shift_rows]
+            if rnd < self._rounds: state = self._mix_column(state)
+            self._add_round_key(state, rnd, ones)
+        return self._from_slices(state, nblocks)
+
+    def encrypt_blocks(self, blocks):
+        ## params:
+        ## blocks = list of the plaintext blocks as 128-bit numbers
+        ##
+        ## returns the list of ciphertext blocks as 128-bit numbers
+        data = b"".join(block.to_bytes(16, "big") for block in blocks)
+        res = self.encrypt_bytes(data)
+        return [int.from_bytes(res[idx:idx+16], "big") for idx in range(0, len(res), 16)]
+
+    def crypt_ctr(self, data, IV, start=0):
+        ## CTR encryption and decryption alike, counting IV+start, IV+start+1,
+        ## ... as the CTR script does; a last partial block takes the leading
+        ## bytes of its key stream block
+        ##
+        ## params:
+        ## data = bytes of any length
+        ## IV = the initiation vector as 128-bit number
+        ## start = index of the counter block of data[0]
+        nblocks = (len(data) + 15) // 16
+        counters = b"".join(((IV + start + idx) & ((1 <<128) - 1)).to_bytes(16, "big") for idx in range(nblocks))
+        keystream = self.encrypt_bytes(counters)
+        return (int.from_bytes(data, "big") ^ int.from_bytes(keystream[:len(data)], "big")).to_bytes(len(data), "big")
+
+
+### main ###
+def main(argv=sys.argv[1:]):
+    ## verifies the FIPS-197 example, then measures bitsliced batches against
+    ## the per-block T-table engine, to find the batch size where the
+    ## bitsliced engine breaks even
+    inputkey = 0x000102030405060708090a0b0c0d0e0f
+    keylength = 128
+    aes = AES(inputkey, keylength, engine="ttable")
+    bitslice = AESBitslice(aes)
+
+    ciphertext = bitslice.encrypt_blocks([0x00112233445566778899aabbccddeeff])[0]
+    print(f"ciphertext: {ciphertext:032x}")
+    if 0x69c4e0d86a7b0430d8cdb78070b4c55a != ciphertext: die("FAILED: FIPS-197 example")
+
+    sizes = [int(arg) for arg in argv] if len(argv) > 0 else [1, 16, 64, 256, 512, 1024, 2048, 4096]
+    print("blocks\tper block [s]\tbitsliced [s]\tspeedup")
+    crossover = None
+    for nblocks in sizes:
+        data = bytes((idx * 7) & 0xff for idx in range(16 * nblocks))
+
+        start = time.perf_counter()
+        blockwise = b"".join(aes.encrypt(int.from_bytes(data[idx:idx+16], "big"), ishex=True).to_bytes(16, "big")
+                             for idx in range(0, len(data), 16))
+        elapsed_block = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = bitslice.encrypt_bytes(data)
+        elapsed_batch = time.perf_counter() - start
+        if batched != blockwise: die("FAILED: bitsliced and per-block results differ")
+
+        speedup = elapsed_block / elapsed_batch
+        if crossover is None and speedup > 1.0: crossover = nblocks
+        print(f"{nblocks}\t{elapsed_block:.4f}\t\t{elapsed_batch:.4f}\t\t{speedup:.2f}")
+
+    if crossover is None: print("bitsliced engine did not break even")
+    else: print(f"bitsliced engine breaks even at about {crossover} blocks")
+
+### start ###
+if __name__ == '__main__':
+    main()
+    print("READY.")
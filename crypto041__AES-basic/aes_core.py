@@ -0,0 +1,1047 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# IMPORTANT: this implementation is meant as an educational demonstration only
+"""
+@author: Lothar Rubusch
+@email: L.Rubusch@gmx.ch
+@license: GPLv3
+
+AES (american encryption standard)
+128-bit block size
+key lengths of 128 bit, 192 bit or 256 bit
+
+the AES core shared by the AES scripts, i.e. aes_simple.py and the mode
+scripts crypto051..crypto058, which import it and only add their mode on top
+
+ - the tables (S-boxes, exp/ln boxes, multiplication tables, T-tables) are
+   built once at import, as flat immutable bytes and tuples, indexed directly
+   by the byte value; all instances share them
+ - the expanded keys are shared through the key schedule cache
+ - the engine is selected per instance, by default the T-table engine
+ - the helpers of the streaming interfaces of the modes (bytes in, bytes out,
+   chunk by chunk) live here as well, see STREAMING
+
+
+AES example
+
+Key:        000102030405060708090a0b0c0d0e0f
+Plaintext:  00112233445566778899aabbccddeeff
+Ciphertext: 69c4e0d86a7b0430d8cdb78070b4c55a
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+## the padding of the last block
+import aes_padding
+
+### tools ###
+
+def die(msg):
+    if 0 < len(msg): print(msg)
+    sys.exit(1)
+
+
+### DEBUGGING ###
+
+DEBUGGING = False
+def DBG(msg):
+    if DEBUGGING: print(msg)
+
+DBG_PRINT_HEX = True
+def tostring(val, nbits):
+    ## push a leading dummy, to obtain leading '0's
+    mask = 0x1 << nbits
+    val += mask
+
+    if DBG_PRINT_HEX:
+        ## hexadecimal representation
+        res = ("%#.x"%val)[:2] + ("%#.x"%val)[3:]
+    else:
+        ## remove the 1 from the mask and return as string w/ leading 0s
+        res = bin(val)[:2] + bin(val)[3:]
+    return res
+
+### /DEBUGGING ###
+
+
+### TRACING ###
+
+## a round observer is any callable observer(rnd, stage, state, key=None); the
+## cipher calls it for every stage of every round with the round index, the
+## name of the stage and the state after that stage, and for "add key" also
+## with the round key; the round loops check for an observer first, so without
+## one no trace is formatted or printed at all
+def print_trace(rnd, stage, state, key=None):
+    ## observer printing the round trace to stdout
+    if key is not None:
+        print(f"R{rnd} (key = {tostring(key, 128)})\t= {state:x}")
+    else:
+        print(f"R{rnd} {stage}: \t{tostring(state, 128)}")
+
+### /TRACING ###
+
+
+### TABLES ###
+
+## the tables are flat, a byte value indexes them directly, e.g. SBOX[0x53]
+## instead of row 0x5 and column 0x3 of a 16x16 matrix
+
+## S-box
+SBOX = bytes([
+    0x63, 0x7c, 0x77, 0x7b, 0xf2, 0x6b, 0x6f, 0xc5, 0x30, 0x01, 0x67, 0x2b, 0xfe, 0xd7, 0xab, 0x76,
+    0xca, 0x82, 0xc9, 0x7d, 0xfa, 0x59, 0x47, 0xf0, 0xad, 0xd4, 0xa2, 0xaf, 0x9c, 0xa4, 0x72, 0xc0,
+    0xb7, 0xfd, 0x93, 0x26, 0x36, 0x3f, 0xf7, 0xcc, 0x34, 0xa5, 0xe5, 0xf1, 0x71, 0xd8, 0x31, 0x15,
+    0x04, 0xc7, 0x23, 0xc3, 0x18, 0x96, 0x05, 0x9a, 0x07, 0x12, 0x80, 0xe2, 0xeb, 0x27, 0xb2, 0x75,
+    0x09, 0x83, 0x2c, 0x1a, 0x1b, 0x6e, 0x5a, 0xa0, 0x52, 0x3b, 0xd6, 0xb3, 0x29, 0xe3, 0x2f, 0x84,
+    0x53, 0xd1, 0x00, 0xed, 0x20, 0xfc, 0xb1, 0x5b, 0x6a, 0xcb, 0xbe, 0x39, 0x4a, 0x4c, 0x58, 0xcf,
+    0xd0, 0xef, 0xaa, 0xfb, 0x43, 0x4d, 0x33, 0x85, 0x45, 0xf9, 0x02, 0x7f, 0x50, 0x3c, 0x9f, 0xa8,
+    0x51, 0xa3, 0x40, 0x8f, 0x92, 0x9d, 0x38, 0xf5, 0xbc, 0xb6, 0xda, 0x21, 0x10, 0xff, 0xf3, 0xd2,
+    0xcd, 0x0c, 0x13, 0xec, 0x5f, 0x97, 0x44, 0x17, 0xc4, 0xa7, 0x7e, 0x3d, 0x64, 0x5d, 0x19, 0x73,
+    0x60, 0x81, 0x4f, 0xdc, 0x22, 0x2a, 0x90, 0x88, 0x46, 0xee, 0xb8, 0x14, 0xde, 0x5e, 0x0b, 0xdb,
+    0xe0, 0x32, 0x3a, 0x0a, 0x49, 0x06, 0x24, 0x5c, 0xc2, 0xd3, 0xac, 0x62, 0x91, 0x95, 0xe4, 0x79,
+    0xe7, 0xc8, 0x37, 0x6d, 0x8d, 0xd5, 0x4e, 0xa9, 0x6c, 0x56, 0xf4, 0xea, 0x65, 0x7a, 0xae, 0x08,
+    0xba, 0x78, 0x25, 0x2e, 0x1c, 0xa6, 0xb4, 0xc6, 0xe8, 0xdd, 0x74, 0x1f, 0x4b, 0xbd, 0x8b, 0x8a,
+    0x70, 0x3e, 0xb5, 0x66, 0x48, 0x03, 0xf6, 0x0e, 0x61, 0x35, 0x57, 0xb9, 0x86, 0xc1, 0x1d, 0x9e,
+    0xe1, 0xf8, 0x98, 0x11, 0x69, 0xd9, 0x8e, 0x94, 0x9b, 0x1e, 0x87, 0xe9, 0xce, 0x55, 0x28, 0xdf,
+    0x8c, 0xa1, 0x89, 0x0d, 0xbf, 0xe6, 0x42, 0x68, 0x41, 0x99, 0x2d, 0x0f, 0xb0, 0x54, 0xbb, 0x16])
+
+## inverse S-box
+INV_SBOX = bytes([
+    0x52, 0x09, 0x6A, 0xD5, 0x30, 0x36, 0xA5, 0x38, 0xBF, 0x40, 0xA3, 0x9E, 0x81, 0xF3, 0xD7, 0xFB,
+    0x7C, 0xE3, 0x39, 0x82, 0x9B, 0x2F, 0xFF, 0x87, 0x34, 0x8E, 0x43, 0x44, 0xC4, 0xDE, 0xE9, 0xCB,
+    0x54, 0x7B, 0x94, 0x32, 0xA6, 0xC2, 0x23, 0x3D, 0xEE, 0x4C, 0x95, 0x0B, 0x42, 0xFA, 0xC3, 0x4E,
+    0x08, 0x2E, 0xA1, 0x66, 0x28, 0xD9, 0x24, 0xB2, 0x76, 0x5B, 0xA2, 0x49, 0x6D, 0x8B, 0xD1, 0x25,
+    0x72, 0xF8, 0xF6, 0x64, 0x86, 0x68, 0x98, 0x16, 0xD4, 0xA4, 0x5C, 0xCC, 0x5D, 0x65, 0xB6, 0x92,
+    0x6C, 0x70, 0x48, 0x50, 0xFD, 0xED, 0xB9, 0xDA, 0x5E, 0x15, 0x46, 0x57, 0xA7, 0x8D, 0x9D, 0x84,
+    0x90, 0xD8, 0xAB, 0x00, 0x8C, 0xBC, 0xD3, 0x0A, 0xF7, 0xE4, 0x58, 0x05, 0xB8, 0xB3, 0x45, 0x06,
+    0xD0, 0x2C, 0x1E, 0x8F, 0xCA, 0x3F, 0x0F, 0x02, 0xC1, 0xAF, 0xBD, 0x03, 0x01, 0x13, 0x8A, 0x6B,
+    0x3A, 0x91, 0x11, 0x41, 0x4F, 0x67, 0xDC, 0xEA, 0x97, 0xF2, 0xCF, 0xCE, 0xF0, 0xB4, 0xE6, 0x73,
+    0x96, 0xAC, 0x74, 0x22, 0xE7, 0xAD, 0x35, 0x85, 0xE2, 0xF9, 0x37, 0xE8, 0x1C, 0x75, 0xDF, 0x6E,
+    0x47, 0xF1, 0x1A, 0x71, 0x1D, 0x29, 0xC5, 0x89, 0x6F, 0xB7, 0x62, 0x0E, 0xAA, 0x18, 0xBE, 0x1B,
+    0xFC, 0x56, 0x3E, 0x4B, 0xC6, 0xD2, 0x79, 0x20, 0x9A, 0xDB, 0xC0, 0xFE, 0x78, 0xCD, 0x5A, 0xF4,
+    0x1F, 0xDD, 0xA8, 0x33, 0x88, 0x07, 0xC7, 0x31, 0xB1, 0x12, 0x10, 0x59, 0x27, 0x80, 0xEC, 0x5F,
+    0x60, 0x51, 0x7F, 0xA9, 0x19, 0xB5, 0x4A, 0x0D, 0x2D, 0xE5, 0x7A, 0x9F, 0x93, 0xC9, 0x9C, 0xEF,
+    0xA0, 0xE0, 0x3B, 0x4D, 0xAE, 0x2A, 0xF5, 0xB0, 0xC8, 0xEB, 0xBB, 0x3C, 0x83, 0x53, 0x99, 0x61,
+    0x17, 0x2B, 0x04, 0x7E, 0xBA, 0x77, 0xD6, 0x26, 0xE1, 0x69, 0x14, 0x63, 0x55, 0x21, 0x0C, 0x7D])
+
+## diffusion layer - galois multiplication, exp and ln boxes
+EXP_BOX = bytes([
+    0x01, 0x03, 0x05, 0x0f, 0x11, 0x33, 0x55, 0xff, 0x1a, 0x2e, 0x72, 0x96, 0xa1, 0xf8, 0x13, 0x35,
+    0x5f, 0xe1, 0x38, 0x48, 0xd8, 0x73, 0x95, 0xa4, 0xf7, 0x02, 0x06, 0x0a, 0x1e, 0x22, 0x66, 0xaa,
+    0xe5, 0x34, 0x5c, 0xe4, 0x37, 0x59, 0xeb, 0x26, 0x6a, 0xbe, 0xd9, 0x70, 0x90, 0xab, 0xe6, 0x31,
+    0x53, 0xf5, 0x04, 0x0c, 0x14, 0x3c, 0x44, 0xcc, 0x4f, 0xd1, 0x68, 0xb8, 0xd3, 0x6e, 0xb2, 0xcd,
+    0x4c, 0xd4, 0x67, 0xa9, 0xe0, 0x3b, 0x4d, 0xd7, 0x62, 0xa6, 0xf1, 0x08, 0x18, 0x28, 0x78, 0x88,
+    0x83, 0x9e, 0xb9, 0xd0, 0x6b, 0xbd, 0xdc, 0x7f, 0x81, 0x98, 0xb3, 0xce, 0x49, 0xdb, 0x76, 0x9a,
+    0xb5, 0xc4, 0x57, 0xf9, 0x10, 0x30, 0x50, 0xf0, 0x0b, 0x1d, 0x27, 0x69, 0xbb, 0xd6, 0x61, 0xa3,
+    0xfe, 0x19, 0x2b, 0x7d, 0x87, 0x92, 0xad, 0xec, 0x2f, 0x71, 0x93, 0xae, 0xe9, 0x20, 0x60, 0xa0,
+    0xfb, 0x16, 0x3a, 0x4e, 0xd2, 0x6d, 0xb7, 0xc2, 0x5d, 0xe7, 0x32, 0x56, 0xfa, 0x15, 0x3f, 0x41,
+    0xc3, 0x5e, 0xe2, 0x3d, 0x47, 0xc9, 0x40, 0xc0, 0x5b, 0xed, 0x2c, 0x74, 0x9c, 0xbf, 0xda, 0x75,
+    0x9f, 0xba, 0xd5, 0x64, 0xac, 0xef, 0x2a, 0x7e, 0x82, 0x9d, 0xbc, 0xdf, 0x7a, 0x8e, 0x89, 0x80,
+    0x9b, 0xb6, 0xc1, 0x58, 0xe8, 0x23, 0x65, 0xaf, 0xea, 0x25, 0x6f, 0xb1, 0xc8, 0x43, 0xc5, 0x54,
+    0xfc, 0x1f, 0x21, 0x63, 0xa5, 0xf4, 0x07, 0x09, 0x1b, 0x2d, 0x77, 0x99, 0xb0, 0xcb, 0x46, 0xca,
+    0x45, 0xcf, 0x4a, 0xde, 0x79, 0x8b, 0x86, 0x91, 0xa8, 0xe3, 0x3e, 0x42, 0xc6, 0x51, 0xf3, 0x0e,
+    0x12, 0x36, 0x5a, 0xee, 0x29, 0x7b, 0x8d, 0x8c, 0x8f, 0x8a, 0x85, 0x94, 0xa7, 0xf2, 0x0d, 0x17,
+    0x39, 0x4b, 0xdd, 0x7c, 0x84, 0x97, 0xa2, 0xfd, 0x1c, 0x24, 0x6c, 0xb4, 0xc7, 0x52, 0xf6, 0x01])
+
+LN_BOX = bytes([
+    0x00, 0x00, 0x19, 0x01, 0x32, 0x02, 0x1a, 0xc6, 0x4b, 0xc7, 0x1b, 0x68, 0x33, 0xee, 0xdf, 0x03,
+    0x64, 0x04, 0xe0, 0x0e, 0x34, 0x8d, 0x81, 0xef, 0x4c, 0x71, 0x08, 0xc8, 0xf8, 0x69, 0x1c, 0xc1,
+    0x7d, 0xc2, 0x1d, 0xb5, 0xf9, 0xb9, 0x27, 0x6a, 0x4d, 0xe4, 0xa6, 0x72, 0x9a, 0xc9, 0x09, 0x78,
+    0x65, 0x2f, 0x8a, 0x05, 0x21, 0x0f, 0xe1, 0x24, 0x12, 0xf0, 0x82, 0x45, 0x35, 0x93, 0xda, 0x8e,
+    0x96, 0x8f, 0xdb, 0xbd, 0x36, 0xd0, 0xce, 0x94, 0x13, 0x5c, 0xd2, 0xf1, 0x40, 0x46, 0x83, 0x38,
+    0x66, 0xdd, 0xfd, 0x30, 0xbf, 0x06, 0x8b, 0x62, 0xb3, 0x25, 0xe2, 0x98, 0x22, 0x88, 0x91, 0x10,
+    0x7e, 0x6e, 0x48, 0xc3, 0xa3, 0xb6, 0x1e, 0x42, 0x3a, 0x6b, 0x28, 0x54, 0xfa, 0x85, 0x3d, 0xba,
+    0x2b, 0x79, 0x0a, 0x15, 0x9b, 0x9f, 0x5e, 0xca, 0x4e, 0xd4, 0xac, 0xe5, 0xf3, 0x73, 0xa7, 0x57,
+    0xaf, 0x58, 0xa8, 0x50, 0xf4, 0xea, 0xd6, 0x74, 0x4f, 0xae, 0xe9, 0xd5, 0xe7, 0xe6, 0xad, 0xe8,
+    0x2c, 0xd7, 0x75, 0x7a, 0xeb, 0x16, 0x0b, 0xf5, 0x59, 0xcb, 0x5f, 0xb0, 0x9c, 0xa9, 0x51, 0xa0,
+    0x7f, 0x0c, 0xf6, 0x6f, 0x17, 0xc4, 0x49, 0xec, 0xd8, 0x43, 0x1f, 0x2d, 0xa4, 0x76, 0x7b, 0xb7,
+    0xcc, 0xbb, 0x3e, 0x5a, 0xfb, 0x60, 0xb1, 0x86, 0x3b, 0x52, 0xa1, 0x6c, 0xaa, 0x55, 0x29, 0x9d,
+    0x97, 0xb2, 0x87, 0x90, 0x61, 0xbe, 0xdc, 0xfc, 0xbc, 0x95, 0xcf, 0xcd, 0x37, 0x3f, 0x5b, 0xd1,
+    0x53, 0x39, 0x84, 0x3c, 0x41, 0xa2, 0x6d, 0x47, 0x14, 0x2a, 0x9e, 0x5d, 0x56, 0xf2, 0xd3, 0xab,
+    0x44, 0x11, 0x92, 0xd9, 0x23, 0x20, 0x2e, 0x89, 0xb4, 0x7c, 0xb8, 0x26, 0x77, 0x99, 0xe3, 0xa5,
+    0x67, 0x4a, 0xed, 0xde, 0xc5, 0x31, 0xfe, 0x18, 0x0d, 0x63, 0x8c, 0x80, 0xc0, 0xf7, 0x70, 0x07])
+
+
+## diffusion layer - shift rows
+SHIFT_ROWS = (0,5,10,15,4,9,14,3,8,13,2,7,12,1,6,11)
+INV_SHIFT_ROWS = tuple(SHIFT_ROWS.index(idx) for idx in range(len(SHIFT_ROWS)))
+
+## diffusion layer - mix columns
+MIX_COLUMNS__CONST_MATRIX = ((0x02,0x03,0x01,0x01),
+                             (0x01,0x02,0x03,0x01),
+                             (0x01,0x01,0x02,0x03),
+                             (0x03,0x01,0x01,0x02))
+
+MIX_COLUMNS__INV_CONST_MATRIX = ((0x0e,0x0b,0x0d,0x09),
+                                 (0x09,0x0e,0x0b,0x0d),
+                                 (0x0d,0x09,0x0e,0x0b),
+                                 (0x0b,0x0d,0x09,0x0e))
+
+## round coefficients
+## source: http://en.wikipedia.org/wiki/Rijndael_key_schedule
+##
+## basically just generated by doubling (left shifting) and applying
+## mod P(x), where P(x) = x^8 + x^4 + x^3 + x + 1
+## only the first some are actually used!!!
+RCON = (0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80, 0x1b, 0x36)
+
+def gfmult(vala, valb):
+    ## Galois Field Multiplication
+    ##
+    ## implementation of a single multiplication under mod P(x)
+    ## this implementation uses the ln and exp table
+    if vala != 0 and valb != 0:
+        return EXP_BOX[(LN_BOX[vala] + LN_BOX[valb]) % 0xff]
+    return 0x0
+
+## diffusion layer - galois multiplication by the constants of the mix columns
+## matrices, precomputed for all 256 byte values, e.g.
+## GFMULT_TABLES[0x0e][val] == gfmult(val, 0x0e)
+GFMULT_TABLES = {const: bytes(gfmult(val, const) for val in range(256))
+                 for const in (0x01, 0x02, 0x03, 0x09, 0x0b, 0x0d, 0x0e)}
+
+def _generate_ttables(sbox, matrix):
+    ## T-tables, SubBytes, ShiftRows and MixColumns fused into four lookup
+    ## tables of 256 32-bit words each
+    ##
+    ## a column of MixColumns is a sum of the columns of the constant matrix,
+    ## each multiplied by one (substituted) input byte; the four products per
+    ## input byte can be precomputed for all 256 values
+    ##
+    ##   Te0[x] = (2*S[x], 1*S[x], 1*S[x], 3*S[x])
+    ##   Te1[x] = (3*S[x], 2*S[x], 1*S[x], 1*S[x])
+    ##   Te2[x] = (1*S[x], 3*S[x], 2*S[x], 1*S[x])
+    ##   Te3[x] = (1*S[x], 1*S[x], 3*S[x], 2*S[x])
+    ##
+    ## Te1..Te3 are byte rotations of Te0; ShiftRows is then just the choice
+    ## of which column feeds which table; the inverse T-tables Td0..Td3 of
+    ## the equivalent inverse cipher are built the same way, from the inverse
+    ## S-box and the InvMixColumns matrix
+    ##
+    ##   Td0[x] = (e*IS[x], 9*IS[x], d*IS[x], b*IS[x])
+    ##
+    ## params:
+    ## sbox = SBOX or INV_SBOX
+    ## matrix = MIX_COLUMNS__CONST_MATRIX or MIX_COLUMNS__INV_CONST_MATRIX
+    tables = [[0]*256 for idx in range(4)]
+    for idx in range(256):
+        val = sbox[idx]
+        word = 0x0
+        for row in range(4):
+            word = (word <<8) | GFMULT_TABLES[matrix[row][0]][val]
+        for tab in range(4):
+            tables[tab][idx] = word
+            ## rotate right by one byte
+            word = ((word >>8) | (word <<24)) & 0xffffffff
+    return tuple(tuple(table) for table in tables)
+
+TE = _generate_ttables(SBOX, MIX_COLUMNS__CONST_MATRIX)
+TD = _generate_ttables(INV_SBOX, MIX_COLUMNS__INV_CONST_MATRIX)
+
+### /TABLES ###
+
+
+### KEY SCHEDULE CACHE ###
+
+class KeyScheduleCache:
+    ## bounded LRU cache of expanded keys, shared by all AES instances
+    ##
+    ## an entry is stored per (inputkey, keylength) and holds everything the
+    ## key schedule produces (see AES._key_schedule); entries are tuples and
+    ## must not be modified, since all instances of the same key share them
+    def __init__(self, maxsize=64):
+        ## params:
+        ## maxsize = number of keys to hold, the least recently used key is
+        ##           dropped first
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, inputkey, keylength):
+        ## returns the entry for the key, or None (counted as miss)
+        with self._lock:
+            entry = self._entries.get((inputkey, keylength))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((inputkey, keylength))
+            self.hits += 1
+            return entry
+
+    def store(self, inputkey, keylength, entry):
+        with self._lock:
+            self._entries[(inputkey, keylength)] = entry
+            self._entries.move_to_end((inputkey, keylength))
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def evict(self, inputkey, keylength):
+        ## drops the key, e.g. when it was rotated out; returns True if the
+        ## key was cached
+        with self._lock:
+            return self._entries.pop((inputkey, keylength), None) is not None
+
+    def clear(self):
+        ## drops all keys and resets the counters
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def resize(self, maxsize):
+        ## changes the bound, dropping least recently used keys if needed
+        with self._lock:
+            self._maxsize = maxsize
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._entries), "maxsize": self._maxsize}
+
+## the cache used by all AES instances
+key_cache = KeyScheduleCache()
+
+### /KEY SCHEDULE CACHE ###
+
+
+### STREAMING ###
+
+## the streaming interfaces of the modes (encrypt_cbc_stream() etc.) take
+## bytes, a memoryview or a readable file object and yield the result chunk by
+## chunk, so memory stays flat for any size of input
+
+## default number of bytes per chunk, a multiple of the block size
+CHUNKSIZE = 64 * 1024
+
+def iter_chunks(source, chunksize=CHUNKSIZE):
+    ## yields the source in chunks of chunksize bytes, only the last chunk
+    ## may be shorter; buffers are not copied, but sliced by a memoryview
+    ##
+    ## params:
+    ## source = bytes, bytearray, memoryview, or a readable file object
+    ## chunksize = number of bytes per chunk, a multiple of 16
+    if 0 >= chunksize or 0 != chunksize % 16: die("chunksize must be a multiple of the blocksize")
+    if hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunksize)
+            if not chunk: return
+            ## pipes or sockets may return less than requested before the end
+            while len(chunk) < chunksize:
+                more = source.read(chunksize - len(chunk))
+                if not more: break
+                chunk += more
+            yield chunk
+            if len(chunk) < chunksize: return
+    else:
+        view = memoryview(source).cast("B")
+        for idx in range(0, len(view), chunksize):
+            yield view[idx:idx+chunksize]
+
+def with_last(chunks):
+    ## yields (chunk, islast) pairs, by looking one chunk ahead; needed where
+    ## the last block is handled differently, e.g. to strip the padding
+    prev = None
+    for chunk in chunks:
+        if prev is not None: yield prev, False
+        prev = chunk
+    if prev is not None: yield prev, True
+
+def xor_bytes(data, keystream):
+    ## XORs data against the leading bytes of keystream, as one number
+    ## instead of byte by byte
+    nbytes = len(data)
+    return (int.from_bytes(data, "big") ^ int.from_bytes(keystream[:nbytes], "big")).to_bytes(nbytes, "big")
+
+def pad(tail, nbytes=16, scheme=aes_padding.PADDING_ISO7816):
+    ## pads the last, broken block, by default by a '1' bit followed by '0's,
+    ## i.e. the byte 0x80 followed by 0x00 bytes (ISO/IEC 7816-4); as
+    ## encrypt() with npaddingbits, but on bytes; see aes_padding.py
+    ##
+    ## params:
+    ## tail = the remaining bytes, less than nbytes
+    ## nbytes = the block size in bytes
+    ## scheme = the padding, PADDING_ISO7816 or PADDING_PKCS7
+    return bytes(aes_padding.pad(bytearray(tail), scheme, nbytes))
+
+def unpad(block, scheme=aes_padding.PADDING_ISO7816):
+    ## removes the padding of pad() from the last block
+    return bytes(aes_padding.unpad(bytearray(block), scheme, len(block)))
+
+### /STREAMING ###
+
+
+class AES:
+    ## the tables are shared by all instances, see TABLES above
+    _sbox = SBOX
+    _inv_sbox = INV_SBOX
+    _exp_box = EXP_BOX
+    _ln_box = LN_BOX
+    _shift_rows = SHIFT_ROWS
+    _inv_shift_rows = INV_SHIFT_ROWS
+    _mix_columns__const_matrix = MIX_COLUMNS__CONST_MATRIX
+    _mix_columns__inv_const_matrix = MIX_COLUMNS__INV_CONST_MATRIX
+    _gfmult_tables = GFMULT_TABLES
+    _rcon = RCON
+    _te = TE
+    _td = TD
+
+    def __init__(self, inputkey, keylength, engine="ttable", observer=None):
+        ## params:
+        ## inputkey = the initial key as hex number
+        ## keylength = 128, 192 or 256 bit
+        ## engine = "reference" runs the round functions layer by layer as
+        ##          described in the literature, "ttable" fuses them into
+        ##          table lookups per column (faster, same results), and
+        ##          decrypts by the equivalent inverse cipher,
+        ##          "bytearray" keeps the state as 16 bytes which are
+        ##          modified in place, instead of a 128-bit number
+        ## observer = round observer, see print_trace(); by default the round
+        ##            trace is printed only when DEBUGGING is set
+
+        ## blocksize
+        self._blocksize = 128
+
+        ## key schedule
+        self._keylength = keylength
+        self._rounds = 10
+        if 192 == self._keylength: self._rounds = 12
+        elif 256 == self._keylength: self._rounds = 14
+        entry = key_cache.lookup(inputkey, self._keylength)
+        if entry is None:
+            entry = self._key_schedule(inputkey, self._keylength)
+            key_cache.store(inputkey, self._keylength, entry)
+        (self._keys, self._roundkeys, self._roundkey_words, self._roundkey_bytes,
+         self._inv_roundkey_words) = entry
+
+        ## tracing
+        self._observer = None
+        self.set_observer(observer if observer is not None else (print_trace if DEBUGGING else None))
+
+        ## engine
+        if engine not in ("reference", "ttable", "bytearray"): die(f"unknown engine '{engine}'")
+        self._engine = engine
+
+
+    ## utilities
+
+    def _gfmult(self,vala, valb):
+        ## Galois Field Multiplication, see gfmult()
+        return gfmult(vala, valb)
+
+    def _tablelookup(self,table,index,offset=0):
+        ## params:
+        ## table = flat table to look up content
+        ## index = a number, containing the 8-bit index at offset
+        ## offset = position of the index in bits, counted from the right
+        ##
+        ## returns table value by the provided index
+        return table[(index >>offset) & 0xff]
+
+    def _getnth(self, hexlst, nth, size):
+        ## params:
+        ## hexlst = a hex value, which serves as list of byte values
+        ## nth = index of a specific byte in hexlst
+        ## size = the full size of the hexlst
+        ##
+        ## return the nth 8-bit number, contained in the hex list (a number)
+        ## where nth is an index, starting with 0
+        return ((hexlst >> (size - (nth+1)*8)) & 0xff)
+
+    def _append(self, hexlst, val, nbytes=1):
+        ## appends an 8-bit hex val to a hex list (a number) of such values
+        ## and returns it
+        ##
+        ## params:
+        ## hexlst = a hex value, which serves as list of byte values
+        ## val = a value e.g. as hex number to be appended
+        ## nbytes = the number of bytes to be appended, the size of val
+        return ((hexlst << (8*nbytes))|val)
+
+    def _cutlastbits(self, hexlst, nbits):
+        ## cuts and returns the last nbits out of a provided value hexlst
+        ##
+        ## params:
+        ## hexlist = the value
+        ## nbits = number of last bits to cut out and return
+        return hexlst & ((1 <<nbits) - 1)
+
+    def _text_to_state(self, text):
+        ## params:
+        ## text = a string, each character taken as one byte (latin-1)
+        ##
+        ## returns the text as number, the first character in the most
+        ## significant byte
+        return int.from_bytes(bytes(text, "iso_8859_1"), "big")
+
+    def _state_to_text(self, state):
+        ## the inverse of _text_to_state(), leading zero bytes are dropped
+        data = "%x"%state
+        if len(data) % 2: data = "0" + data
+        return bytes.fromhex(data).decode("iso_8859_1")
+
+    ## methods
+    def _key_schedule(self, password, keylength):
+        ## key expansion for AES
+        ##
+        ## at instatiation of the cipher class this generates all subkeys and
+        ## initializes a list of subkeys which then is accessible by the round
+        ## index
+        ##
+        ## params:
+        ## password = the initial key
+        ## keylength = the specific applied key length, for AES this may be
+        ## 128 bit, 192 bit or 256 bit
+        ##
+        ## returns a tuple of
+        ## words = the 32-bit words of the expanded key
+        ## roundkeys = per round, the round key as 128-bit number
+        ## roundkey_words = per round, the round key as four 32-bit column words
+        ## roundkey_bytes = per round, the round key as 16 bytes
+        ## inv_roundkey_words = per round, the round keys of the equivalent
+        ##         inverse cipher as four 32-bit column words
+        ##
+        ## init, e.g. keylength 128 and password:
+        ## 0x000102030405060708090a0b0c0d0e0f
+        Nb = 4
+        Nk = int(keylength / 32)
+        Nr = Nk + 6 # rounds keys
+        words = []
+        words = [0] * Nb * (Nr+1)
+        temp = 0x0
+
+        ## split initial key into four pieces
+        ## 0x00010203 0x04050607 0x08090a0b 0x0c0d0e0f
+        for idx in range(Nk):
+            words[idx] = (password >>(keylength - (idx+1) * 32)) & 0xffffffff
+
+        for idx in range(Nk, Nb*(Nr+1)): # round 4. -> 44. (128-bit)
+            words[idx] = 0x0
+
+            ## init temp to the last quadruple
+            temp = words[idx-1]
+
+            nextword = 0x0
+            if idx % Nk == 0:
+                ## first word block, rotate and substitute
+
+                ## rotate word
+                swap = (temp >>24) & 0xff
+                temp = ((temp <<8) & 0xffffffff)|swap
+                ## temp: 0x0d0e0f0c
+
+                ## s-boxing and r-coefficient
+                for sub in range(4):
+                    ## s-boxing
+                    ch = self._tablelookup(self._sbox, temp, (32-8*(sub+1)))
+                    ## ch: d7
+
+                    ## the 0. char, XOR against round coefficient
+                    if sub == 0: ch ^= self._rcon[int(idx/Nk) -1]
+                    ## ch: d7
+
+                    ## append new character
+                    nextword = self._append(nextword, ch)
+                    ## swap: d6
+
+                temp = nextword
+                ## temp: 0xd6ab76fe
+
+            elif Nk > 6 and idx % Nk == 4:
+                ## keylength above 128-bit, additional substitutions
+                for sub in range(4):
+                    ## s-boxing
+                    ch = self._tablelookup(self._sbox, temp, (32-8*(sub+1)))
+
+                    ## append new character
+                    nextword = self._append(nextword, ch)
+
+                temp = nextword
+                ## temp: 0xd6ab76fe
+
+            ## assign the preceeding word, XORed against the current temp
+            words[idx] = words[idx-Nk] ^ temp
+
+        ## the round keys are prepared once here in the forms the engines XOR
+        ## against the state, instead of assembling them from the words in
+        ## every round of every block
+        words = tuple(words)
+        roundkey_words = tuple(words[rnd*Nb:rnd*Nb+Nb] for rnd in range(Nr+1))
+        roundkeys = tuple(w0 <<96 | w1 <<64 | w2 <<32 | w3 for w0, w1, w2, w3 in roundkey_words)
+        roundkey_bytes = tuple(key.to_bytes(16, "big") for key in roundkeys)
+
+        ## equivalent inverse cipher (FIPS-197, 5.3.5), the inner round keys
+        ## are passed through InvMixColumns, so that decryption can apply
+        ## InvMixColumns before AddRoundKey, in the same order of layers as
+        ## encryption
+        inv_roundkey_words = [roundkey_words[0]]
+        for rnd in range(1, Nr):
+            key = self._diffusion_layer__mix_column_tables(roundkeys[rnd], self._mix_columns__inv_const_matrix)
+            inv_roundkey_words.append((key >>96, key >>64 & 0xffffffff, key >>32 & 0xffffffff, key & 0xffffffff))
+        inv_roundkey_words.append(roundkey_words[Nr])
+        inv_roundkey_words = tuple(inv_roundkey_words)
+
+        return words, roundkeys, roundkey_words, roundkey_bytes, inv_roundkey_words
+
+    def _add_round_key(self, state, rnd):
+        ## add a round key
+        ##
+        ## params:
+        ## state = current state, the text to be encrypted or decrypted as hex
+        ##         value
+        ## rnd = current round index
+        key = self._roundkeys[rnd]
+        ret = key ^ state
+        if self._observer is not None: self._observer(rnd, "add key", ret, key)
+        return ret
+
+    def _substitution_layer__sub_bytes(self, state, table):
+        ## substitution per 8-bit values
+        ##
+        ## params:
+        ## state = current state, the text to be encrypted or decrypted as hex
+        ##         value
+        ## table = the substitution matrix either for encryption (self._sbox) or
+        ##         decryption (self._inv_sbox)
+        hexlst = 0x0
+        for idx in range(int(self._blocksize/8)):
+            ch = self._getnth(state, idx, self._blocksize)
+            val = self._tablelookup(table, ch)
+            hexlst = self._append(hexlst, val)
+        return hexlst
+
+    def _diffusion_layer__shift_rows(self, state, table):
+        ## first operation in the diffusion layer on 8-bit values
+        ##
+        ## params:
+        ## state = current state, the text to be encrypted or decrypted as hex
+        ##         value
+        ## table = the specific shift rows mapping table, for encryption
+        ##         (self._shift_rows) or decryption (self._inv_shift_rows)
+        hexlst = 0x0
+        for idx in range(int(self._blocksize/8)):
+            hexlst = self._append(hexlst, self._getnth(state, table[idx], self._blocksize))
+        return hexlst
+
+## not used here, just code snippet
+    def _diffusion_layer__mix_column_TRICK(self, state):
+        ## major diffusion element on 8-bit values
+        ##
+        ## matrix-matrix-multiplication in GF(2^8)
+        ## with P(x) = x^8 + x^4 + x^3 + x + 1
+        ##
+        ## operation as depicted
+        ##
+        ##  / c0 \      / 2 3 1 1 \     / b0 \
+        ## |  c1  |    |  1 2 3 1  |   |  b1  |
+        ## |  c2  | == |  1 1 2 3  | * |  b2  |
+        ##  \ c3 /      \ 3 1 1 2 /     \ b3 /
+        ##
+        ## where B = state/input, and C = states/output
+        ##
+        ## the here implemented mix-columns avoids dealing with exp and ln
+        ## tables for calculation a generic GF-multiplication, but takes
+        ## advantage of the fact, that multiplying by 1 results in the identity,
+        ## and by 2 is actually a left shift mod P(x) operation; multiplying by
+        ## 3 then is a combination of both; any further operation as used for
+        ## the inverse matrix at decryption, then, is not as easy and will need
+        ## a generic GF-multiplication implementation, as also implemented here
+        ##
+        ## Galois Field restrictions:
+        ## * Addition: XOR operation
+        ## * Multiplication: leftshift, with modular reduction to P(x)
+        ##
+        ## in specific:
+        ## * the factor 1 will multiply by identity, means just take the b-value
+        ## * the factor 2 is a doubling (leftshift by 1) and modular reduction
+        ##   here named b vector
+        ## * the factor 3 is a XOR combination of 1 and 2, since 3x = x + 2x,
+        ##   here named bb and b vector
+        ## * this does NOT WORK FOR DECRIPTION
+        ##
+        ## params:
+        ## state = current state, the text to be encrypted as hex value
+        hexlst = 0x0
+        for col in range(len(self._mix_columns__const_matrix[0])):
+            b_vec = [0]*4
+            bb_vec = [0]*4
+            for row in range(len(self._mix_columns__const_matrix)):
+                ## 1. left shift by factor for each vector value
+                ## 2. XOR the shifted vector results
+                b_vec[row] = self._getnth(state, row+(4*col), self._blocksize)
+
+                ## write doubled b-values into bb-vec,
+                ## GF(2^8), perform modular reduction by mod P(x), which is
+                ## P(x) = x^8 + x^4 + x^3 + x + 1
+                ##
+                ## if b_vec[row] & 0x80:
+                ##     bb_vec[row] = b_vec[row] <<1 ^ 0x11b
+                ## else:
+                ##     bb_vec[row] = b_vec[row] <<1
+                ##
+                ## brief implementation of the above
+                bb_vec[row] = b_vec[row] <<1 ^ 0x11b if b_vec[row] & 0x80 else b_vec[row] <<1
+                ##
+            hexlst = self._append(hexlst, (bb_vec[0] ^  b_vec[1] ^ bb_vec[1] ^  b_vec[2] ^  b_vec[3]))
+            hexlst = self._append(hexlst, ( b_vec[0] ^ bb_vec[1] ^  b_vec[2] ^ bb_vec[2] ^  b_vec[3]))
+            hexlst = self._append(hexlst, ( b_vec[0] ^  b_vec[1] ^ bb_vec[2] ^  b_vec[3] ^ bb_vec[3]))
+            hexlst = self._append(hexlst, ( b_vec[0] ^ bb_vec[0] ^  b_vec[1] ^  b_vec[2] ^ bb_vec[3]))
+        return hexlst
+
+    def _diffusion_layer__mix_column(self, state, table):
+        ## a generic mix-columns, taking advantage of a generic
+        ## GF-multiplication implementation; depending on the passed table,
+        ## either encryption or decryption is performed
+        ##
+        ## properties/operations in the Galois Field:
+        ## '+' corresponds to XOR, thus no difference between '+' and '-'
+        ## '*' correspondes to a multiplication, then mod P(x)
+        ##
+        ## the polynomial expression can be written equally in binary form, e.g.
+        ## P(x) = x^8 + x^4 + x^3 + x + 1, then corresponds to
+        ##      = 100011011 or 0x11b
+        ##
+        ## params:
+        ## state = current state (hex value) of the cipher text or plaintext
+        ## table = either the constant encryption table
+        ##         (self._mix_columns__const_matrix) or its inverse for
+        ##         decryption (self._mix_columns__inv_const_matrix)
+        res = 0x0
+        for col in range(4):
+            for row in range(4):
+                arr = []
+                for ccol in range(len(table[0])):
+                    vala = state >>(120 - ((col*4 + ccol)*8)) & 0xff
+                    arr.append(self._gfmult(vala, table[row][ccol]))
+                from functools import reduce ## python3
+                val = reduce(lambda x,y: x^y, arr)
+                res = self._append(res, val)
+        return res
+
+    def _diffusion_layer__mix_column_tables(self, state, table):
+        ## mix-columns by the precomputed multiplication tables
+        ## (self._gfmult_tables), instead of the generic GF-multiplication;
+        ## works for encryption and decryption alike, since the tables cover
+        ## the constants of both matrices
+        ##
+        ## params:
+        ## state = current state (hex value) of the cipher text or plaintext
+        ## table = either the constant encryption table
+        ##         (self._mix_columns__const_matrix) or its inverse for
+        ##         decryption (self._mix_columns__inv_const_matrix)
+        mul0, mul1, mul2, mul3 = [[self._gfmult_tables[const] for const in row] for row in table]
+        res = 0x0
+        for col in range(4):
+            word = state >>(96 - col*32)
+            b0 = word >>24 & 0xff
+            b1 = word >>16 & 0xff
+            b2 = word >>8 & 0xff
+            b3 = word & 0xff
+            res = self._append(res, mul0[0][b0] ^ mul0[1][b1] ^ mul0[2][b2] ^ mul0[3][b3])
+            res = self._append(res, mul1[0][b0] ^ mul1[1][b1] ^ mul1[2][b2] ^ mul1[3][b3])
+            res = self._append(res, mul2[0][b0] ^ mul2[1][b1] ^ mul2[2][b2] ^ mul2[3][b3])
+            res = self._append(res, mul3[0][b0] ^ mul3[1][b1] ^ mul3[2][b2] ^ mul3[3][b3])
+        return res
+
+    ## byte state, the state is a bytearray of 16 bytes, column by column,
+    ## i.e. state[row + 4*col]; all layers modify the passed state in place
+
+    def _add_round_key__bytes(self, state, rnd):
+        ## params:
+        ## state = current state as bytearray
+        ## rnd = current round index
+        key = self._roundkey_bytes[rnd]
+        for idx in range(16):
+            state[idx] ^= key[idx]
+
+    def _substitution_layer__sub_bytes__bytes(self, state, table):
+        ## params:
+        ## state = current state as bytearray
+        ## table = the substitution table, self._sbox or self._inv_sbox
+        state[:] = state.translate(table)
+
+    def _diffusion_layer__shift_rows__bytes(self, state, table):
+        ## params:
+        ## state = current state as bytearray
+        ## table = the specific shift rows mapping table, for encryption
+        ##         (self._shift_rows) or decryption (self._inv_shift_rows)
+        state[:] = bytes(state[idx] for idx in table)
+
+    def _diffusion_layer__mix_column__bytes(self, state, table):
+        ## params:
+        ## state = current state as bytearray
+        ## table = either the constant encryption table
+        ##         (self._mix_columns__const_matrix) or its inverse for
+        ##         decryption (self._mix_columns__inv_const_matrix)
+        mul0, mul1, mul2, mul3 = [[self._gfmult_tables[const] for const in row] for row in table]
+        for col in range(0, 16, 4):
+            b0, b1, b2, b3 = state[col:col+4]
+            state[col]   = mul0[0][b0] ^ mul0[1][b1] ^ mul0[2][b2] ^ mul0[3][b3]
+            state[col+1] = mul1[0][b0] ^ mul1[1][b1] ^ mul1[2][b2] ^ mul1[3][b3]
+            state[col+2] = mul2[0][b0] ^ mul2[1][b1] ^ mul2[2][b2] ^ mul2[3][b3]
+            state[col+3] = mul3[0][b0] ^ mul3[1][b1] ^ mul3[2][b2] ^ mul3[3][b3]
+
+    def _encrypt_bytes(self, state):
+        ## encryption on a byte state; the hex number is converted only once
+        ## on entry and once on return
+        ##
+        ## params:
+        ## state = the plaintext block as hex number
+        observer = self._observer
+        buf = bytearray(state.to_bytes(16, "big"))
+
+        self._add_round_key__bytes(buf, 0)
+        for rnd in range(1, self._rounds):
+            self._substitution_layer__sub_bytes__bytes(buf, self._sbox)
+            self._diffusion_layer__shift_rows__bytes(buf, self._shift_rows)
+            self._diffusion_layer__mix_column__bytes(buf, self._mix_columns__const_matrix)
+            self._add_round_key__bytes(buf, rnd)
+            if observer is not None: observer(rnd, "round", int.from_bytes(buf, "big"))
+        self._substitution_layer__sub_bytes__bytes(buf, self._sbox)
+        self._diffusion_layer__shift_rows__bytes(buf, self._shift_rows)
+        self._add_round_key__bytes(buf, self._rounds)
+
+        state = int.from_bytes(buf, "big")
+        if observer is not None: observer(self._rounds, "output", state)
+        return state
+
+    def _decrypt_bytes(self, state):
+        ## decryption on a byte state
+        ##
+        ## params:
+        ## state = the ciphertext block as hex number
+        observer = self._observer
+        buf = bytearray(state.to_bytes(16, "big"))
+
+        self._add_round_key__bytes(buf, self._rounds)
+        self._diffusion_layer__shift_rows__bytes(buf, self._inv_shift_rows)
+        self._substitution_layer__sub_bytes__bytes(buf, self._inv_sbox)
+        for rnd in range(self._rounds-1, 0, -1):
+            if observer is not None: observer(rnd, "round", int.from_bytes(buf, "big"))
+            self._add_round_key__bytes(buf, rnd)
+            self._diffusion_layer__mix_column__bytes(buf, self._mix_columns__inv_const_matrix)
+            self._diffusion_layer__shift_rows__bytes(buf, self._inv_shift_rows)
+            self._substitution_layer__sub_bytes__bytes(buf, self._inv_sbox)
+        self._add_round_key__bytes(buf, 0)
+
+        state = int.from_bytes(buf, "big")
+        if observer is not None: observer(0, "output", state)
+        return state
+
+
+    ## public interface
+
+    def set_observer(self, observer):
+        ## registers a round observer, or removes it by passing None
+        ##
+        ## params:
+        ## observer = callable observer(rnd, stage, state, key=None)
+        self._observer = observer
+
+    def encrypt(self, plaintext, ishex=False, npaddingbits=0):
+        ## params
+        ## plaintext = the plaintext as string or as hex number
+        ## ishex = if the plaintext was a hex number (True)
+        ## npaddingbits = pads a broken block by a '1' and npaddingbits-1 '0's
+
+        ## init
+        if ishex: state = plaintext
+        else: state = self._cutlastbits(self._text_to_state(plaintext), self._blocksize)
+
+        ## padding for broken blocks
+        if 0 < npaddingbits:
+            DBG( "padding (before): \t%s"%tostring(state, 128))
+            padding = 1 <<(npaddingbits-1)
+            state = (state <<(npaddingbits)) | padding
+            DBG( "padding (after): \t%s"%tostring(state, 128))
+
+        observer = self._observer
+        if observer is not None: observer(0, "plaintext", state)
+
+        if "ttable" == self._engine: return self._encrypt_ttable(state)
+        if "bytearray" == self._engine: return self._encrypt_bytes(state)
+
+        ## round 0
+        state = self._add_round_key(state, 0)
+
+        for rnd in range(self._rounds-1):
+            state = self._substitution_layer__sub_bytes(state, self._sbox)
+            if observer is not None: observer(rnd+1, "substitute", state)
+
+            state = self._diffusion_layer__shift_rows(state, self._shift_rows)
+            if observer is not None: observer(rnd+1, "shift rows", state)
+
+            ## alternative implementation
+#            state = self._diffusion_layer__mix_column_TRICK(state) # KEEP!
+            ## more generic implementation
+#            state = self._diffusion_layer__mix_column(state, self._mix_columns__const_matrix) # KEEP!
+            ## precomputed multiplication tables
+            state = self._diffusion_layer__mix_column_tables(state, self._mix_columns__const_matrix)
+            ## /alternative implementation
+            if observer is not None: observer(rnd+1, "mix column", state)
+
+            state = self._add_round_key(state, rnd+1)
+
+        ## round n
+        state = self._substitution_layer__sub_bytes(state, self._sbox)
+        if observer is not None: observer(self._rounds, "substitute", state)
+
+        state = self._diffusion_layer__shift_rows(state, self._shift_rows)
+        if observer is not None: observer(self._rounds, "shift rows", state)
+
+        state = self._add_round_key(state, self._rounds)
+        return state
+
+    def _encrypt_ttable(self, state):
+        ## encryption by T-tables, the state is kept in four 32-bit column
+        ## words s0..s3, each round reduces to 16 table lookups and XORs
+        ##
+        ## params:
+        ## state = the plaintext block as hex number
+        te0, te1, te2, te3 = self._te
+        sbox = self._sbox
+        observer = self._observer
+
+        ## round 0
+        k0, k1, k2, k3 = self._roundkey_words[0]
+        s0 = (state >>96) ^ k0
+        s1 = (state >>64 & 0xffffffff) ^ k1
+        s2 = (state >>32 & 0xffffffff) ^ k2
+        s3 = (state & 0xffffffff) ^ k3
+
+        for rnd in range(1, self._rounds):
+            k0, k1, k2, k3 = self._roundkey_words[rnd]
+            ## ShiftRows: the n-th row of column c is taken from column c+n
+            t0 = te0[s0 >>24] ^ te1[s1 >>16 & 0xff] ^ te2[s2 >>8 & 0xff] ^ te3[s3 & 0xff] ^ k0
+            t1 = te0[s1 >>24] ^ te1[s2 >>16 & 0xff] ^ te2[s3 >>8 & 0xff] ^ te3[s0 & 0xff] ^ k1
+            t2 = te0[s2 >>24] ^ te1[s3 >>16 & 0xff] ^ te2[s0 >>8 & 0xff] ^ te3[s1 & 0xff] ^ k2
+            t3 = te0[s3 >>24] ^ te1[s0 >>16 & 0xff] ^ te2[s1 >>8 & 0xff] ^ te3[s2 & 0xff] ^ k3
+            s0, s1, s2, s3 = t0, t1, t2, t3
+            if observer is not None: observer(rnd, "round", s0 <<96 | s1 <<64 | s2 <<32 | s3)
+
+        ## round n, no MixColumns, thus plain S-box lookups
+        rnd = self._rounds
+        k0, k1, k2, k3 = self._roundkey_words[rnd]
+        t0 = (sbox[s0 >>24] <<24 | sbox[s1 >>16 & 0xff] <<16 | sbox[s2 >>8 & 0xff] <<8 | sbox[s3 & 0xff]) ^ k0
+        t1 = (sbox[s1 >>24] <<24 | sbox[s2 >>16 & 0xff] <<16 | sbox[s3 >>8 & 0xff] <<8 | sbox[s0 & 0xff]) ^ k1
+        t2 = (sbox[s2 >>24] <<24 | sbox[s3 >>16 & 0xff] <<16 | sbox[s0 >>8 & 0xff] <<8 | sbox[s1 & 0xff]) ^ k2
+        t3 = (sbox[s3 >>24] <<24 | sbox[s0 >>16 & 0xff] <<16 | sbox[s1 >>8 & 0xff] <<8 | sbox[s2 & 0xff]) ^ k3
+        state = t0 <<96 | t1 <<64 | t2 <<32 | t3
+        if observer is not None: observer(rnd, "output", state)
+        return state
+
+
+    def _decrypt_ttable(self, state):
+        ## decryption by the equivalent inverse cipher, with the inverse
+        ## T-tables and the InvMixColumns transformed round keys; same
+        ## structure as _encrypt_ttable(), but InvShiftRows takes the n-th row
+        ## of column c from column c-n
+        ##
+        ## params:
+        ## state = the ciphertext block as hex number
+        td0, td1, td2, td3 = self._td
+        inv_sbox = self._inv_sbox
+        observer = self._observer
+
+        ## round n
+        k0, k1, k2, k3 = self._inv_roundkey_words[self._rounds]
+        s0 = (state >>96) ^ k0
+        s1 = (state >>64 & 0xffffffff) ^ k1
+        s2 = (state >>32 & 0xffffffff) ^ k2
+        s3 = (state & 0xffffffff) ^ k3
+
+        for rnd in range(self._rounds-1, 0, -1):
+            k0, k1, k2, k3 = self._inv_roundkey_words[rnd]
+            t0 = td0[s0 >>24] ^ td1[s3 >>16 & 0xff] ^ td2[s2 >>8 & 0xff] ^ td3[s1 & 0xff] ^ k0
+            t1 = td0[s1 >>24] ^ td1[s0 >>16 & 0xff] ^ td2[s3 >>8 & 0xff] ^ td3[s2 & 0xff] ^ k1
+            t2 = td0[s2 >>24] ^ td1[s1 >>16 & 0xff] ^ td2[s0 >>8 & 0xff] ^ td3[s3 & 0xff] ^ k2
+            t3 = td0[s3 >>24] ^ td1[s2 >>16 & 0xff] ^ td2[s1 >>8 & 0xff] ^ td3[s0 & 0xff] ^ k3
+            s0, s1, s2, s3 = t0, t1, t2, t3
+            if observer is not None: observer(rnd, "round", s0 <<96 | s1 <<64 | s2 <<32 | s3)
+
+        ## round 0, no InvMixColumns
+        k0, k1, k2, k3 = self._inv_roundkey_words[0]
+        t0 = (inv_sbox[s0 >>24] <<24 | inv_sbox[s3 >>16 & 0xff] <<16 | inv_sbox[s2 >>8 & 0xff] <<8 | inv_sbox[s1 & 0xff]) ^ k0
+        t1 = (inv_sbox[s1 >>24] <<24 | inv_sbox[s0 >>16 & 0xff] <<16 | inv_sbox[s3 >>8 & 0xff] <<8 | inv_sbox[s2 & 0xff]) ^ k1
+        t2 = (inv_sbox[s2 >>24] <<24 | inv_sbox[s1 >>16 & 0xff] <<16 | inv_sbox[s0 >>8 & 0xff] <<8 | inv_sbox[s3 & 0xff]) ^ k2
+        t3 = (inv_sbox[s3 >>24] <<24 | inv_sbox[s2 >>16 & 0xff] <<16 | inv_sbox[s1 >>8 & 0xff] <<8 | inv_sbox[s0 & 0xff]) ^ k3
+        state = t0 <<96 | t1 <<64 | t2 <<32 | t3
+        if observer is not None: observer(0, "output", state)
+        return state
+
+
+    def decrypt(self, ciphertext, asnum=False, ispadded=False, ashex=False):
+        ## params:
+        ## ciphertext = the ciphertext as hex number
+        ## asnum = return the integer representation
+        ## ispadded = is ciphertext, or does it contain a padding block?
+        ## ashex = return the hex digits as string, 32 digits
+
+        state = ciphertext
+
+        if self._observer is not None: self._observer(self._rounds, "ciphertext", state)
+
+        if "ttable" == self._engine: state = self._decrypt_ttable(state)
+        elif "bytearray" == self._engine: state = self._decrypt_bytes(state)
+        else: state = self._decrypt_reference(state)
+
+        if ispadded:
+            ## cut off the padding '0's and the '1' at once, the lowest set
+            ## bit is state & -state
+            if 0 == state: die("invalid padding")
+            state >>= (state & -state).bit_length()
+
+        ## as number
+        if asnum: return state
+
+        ## convert to string
+        if ashex:
+            ## append trailing zeros, for string encoding, the string is reduced
+            ## to the significant digits implicitely
+            data = "%x"%state
+            while len(data) < 32: data += "0"
+            return data
+        return self._state_to_text(state)
+
+    def _decrypt_reference(self, state):
+        ## decryption, layer by layer in inverse order
+        ##
+        ## params:
+        ## state = the ciphertext block as hex number
+
+        observer = self._observer
+
+        ## round n
+        state = self._add_round_key(state, self._rounds)
+
+        state = self._diffusion_layer__shift_rows(state, self._inv_shift_rows)
+        if observer is not None: observer(self._rounds, "shift rows", state)
+
+        state = self._substitution_layer__sub_bytes(state, self._inv_sbox)
+        if observer is not None: observer(self._rounds, "substitute", state)
+
+        for rnd in range(self._rounds-2,-1,-1):
+            state = self._add_round_key(state, rnd+1)
+
+            ## generic implementation
+#            state = self._diffusion_layer__mix_column(state, self._mix_columns__inv_const_matrix) # KEEP!
+            ## precomputed multiplication tables
+            state = self._diffusion_layer__mix_column_tables(state, self._mix_columns__inv_const_matrix)
+            if observer is not None: observer(rnd+1, "mix column", state)
+
+            state = self._diffusion_layer__shift_rows(state, self._inv_shift_rows)
+            if observer is not None: observer(rnd+1, "shift rows", state)
+
+            state = self._substitution_layer__sub_bytes(state, self._inv_sbox)
+            if observer is not None: observer(rnd+1, "substitute", state)
+
+        state = self._add_round_key(state, 0)
+        return state
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# IMPORTANT: this implementation is meant as an educational demonstration only
+"""
+@author: Lothar Rubusch
+@email: L.Rubusch@gmx.ch
+@license: GPLv3
+
+GHASH, the universal hash function of GCM (NIST SP 800-38D)
+
+GHASH works in GF(2^128) with the reduction polynomial
+x^128 + x^7 + x^2 + x + 1, and multiplies by a fixed hash subkey H = e[k](0)
+
+    g[0] = 0
+    g[i] = (g[i-1] XOR y[i]) * H   ; 1 <= i <= n
+
+the blocks are 128-bit numbers, the first byte the most significant one; GCM
+reflects the bits, bit 0 of a block is the most significant bit of the
+number, thus multiplication by x is a shift right, and a bit falling off at
+the right is reduced by XORing R = 0xe1 << 120 into the left
+
+ - gf128_mult(): bit by bit multiplication, Algorithm 1 of the standard; one
+   shift and conditional XOR per bit, the reference
+ - GHash: Shoup's table driven multiplication; since H is fixed per key, the
+   products of H by all 256 byte values are precomputed once per key, then a
+   block takes 16 lookups, shifts by 8 bit and a lookup into a reduction
+   table, instead of 128 steps
+
+
+AES example
+
+Key:        000102030405060708090a0b0c0d0e0f
+Plaintext:  00112233445566778899aabbccddeeff
+Ciphertext: 69c4e0d86a7b0430d8cdb78070b4c55a
+"""
+
+import sys, time
+
+### tools ###
+
+def die(msg):
+    if 0 < len(msg): print(msg)
+    sys.exit(1)
+
+
+### GF(2^128) ###
+
+## the reduction polynomial, bit reflected
+GF128_R = 0xe1 <<120
+
+def gf128_mult(vala, valb):
+    ## multiplication in GF(2^128) as by the GCM standard, bit by bit
+    ##
+    ## params:
+    ## vala, valb = the factors as 128-bit numbers
+    res = 0
+    val = valb
+    for idx in range(127, -1, -1):
+        if (vala >>idx) & 0x1: res ^= val
+        ## val * x, a shift right with the reduction
+        if val & 0x1: val = (val >>1) ^ GF128_R
+        else: val >>= 1
+    return res
+
+def _gf128_shift8_table():
+    ## the reduction of the 8 bits falling off by a multiplication by x^8,
+    ## z * x^8 = (z >> 8) XOR R8[z & 0xff]; it does not depend on the key
+    table = []
+    for rest in range(256):
+        val = rest
+        for idx in range(8):
+            if val & 0x1: val = (val >>1) ^ GF128_R
+            else: val >>= 1
+        table.append(val)
+    return tuple(table)
+
+GF128_R8 = _gf128_shift8_table()
+
+## blocks per aggregated reduction step, see GHashAggregated
+GHASH_AGGREGATE = 8
+
+
+### GHASH ###
+
+def zeropad(data, nbytes=16):
+    ## pads data by '0' bytes to a multiple of nbytes, as GHASH pads the AAD
+    ## and the ciphertext
+    rest = len(data) % nbytes
+    if 0 == rest: return bytes(data)
+    return bytes(data) + bytes(nbytes - rest)
+
+def _ghash_table(H):
+    ## the multiplication table of H, M[b] = (b << 120) * H for all bytes b
+    ##
+    ## a block X is the sum of its bytes b[j] << (120 - 8*j), where a shift
+    ## right by 8*j is the multiplication by x^(8*j), thus
+    ##
+    ##   X * H = sum of M[b[j]] * x^(8*j)
+    ##
+    ## evaluated by Horner's scheme from the last byte on; M[b] is linear in
+    ## b, the entries for the single bits are H, H*x, ..., H*x^7, the
+    ## remaining entries are XORed from them
+    table = [0] * 256
+    val = H
+    bit = 0x80
+    while bit:
+        table[bit] = val
+        if val & 0x1: val = (val >>1) ^ GF128_R
+        else: val >>= 1
+        bit >>= 1
+    for idx in range(256):
+        if 0 == table[idx] and idx & (idx - 1):
+            low = idx & -idx
+            table[idx] = table[low] ^ table[idx ^ low]
+    return tuple(table)
+
+class GHash:
+    def __init__(self, H):
+        ## params:
+        ## H = the hash subkey, e[k](0), as 128-bit number
+        self._H = H
+        self._table = _ghash_table(H)
+
+    def mult(self, val):
+        ## returns val * H
+        ##
+        ## params:
+        ## val = the factor as 128-bit number
+        table = self._table
+        red = GF128_R8
+        data = val.to_bytes(16, "big")
+        res = table[data[15]]
+        for idx in range(14, -1, -1):
+            res = (res >>8) ^ red[res & 0xff] ^ table[data[idx]]
+        return res
+
+    def update(self, data, g=0):
+        ## params:
+        ## data = bytes, a multiple of 16 bytes long
+        ## g = the hash so far, 0 at start
+        ##
+        ## returns the hash after data, g[i] = (g[i-1] XOR y[i]) * H
+        if 0 != len(data) % 16: die("GHASH data must be a multiple of the blocksize")
+        mult = self.mult
+        for idx in range(0, len(data), 16):
+            g = mult(g ^ int.from_bytes(data[idx:idx+16], "big"))
+        return g
+
+
+class GHashAggregated(GHash):
+    ## GHASH over k blocks per step, with aggregated reduction
+    ##
+    ## the serial form has a chain of dependent multiplications, each block
+    ## waits for the previous product; unrolled over k blocks it is
+    ##
+    ##   g[i+k] = (g[i] XOR y[i+1]) * H^k XOR y[i+2] * H^(k-1) XOR ...
+    ##            XOR y[i+k] * H
+    ##
+    ## the k multiplications are independent; with the tables M_1 .. M_k of
+    ## H^1 .. H^k precomputed per key, the products are summed byte position
+    ## by byte position, and Horner's shift and reduction by x^8 is applied
+    ## once to the sum, instead of once per product
+    ##
+    ##   sum = sum over j of x^(8*j) * (M_k[b1[j]] XOR ... XOR M_1[bk[j]])
+    ##
+    ## thus k blocks cost 16 reductions, instead of 16*k
+    def __init__(self, H, k=GHASH_AGGREGATE):
+        ## params:
+        ## H = the hash subkey, e[k](0), as 128-bit number
+        ## k = number of blocks per reduction step
+        super().__init__(H)
+        if 1 > k: die("at least one block per step")
+        self._k = k
+        ## H, H^2, ..., H^k and their tables, the block first in a step is
+        ## multiplied by the highest power
+        powers = [H]
+        for idx in range(k-1): powers.append(self.mult(powers[-1]))
+        self._powers = tuple(powers)
+        self._tables = tuple(_ghash_table(power) for power in reversed(powers))
+
+    def update(self, data, g=0):
+        ## params:
+        ## data = bytes, a multiple of 16 bytes long
+        ## g = the hash so far, 0 at start
+        ##
+        ## returns the hash after data, the same as GHash.update()
+        if 0 != len(data) % 16: die("GHASH data must be a multiple of the blocksize")
+        k = self._k
+        tables = self._tables
+        red = GF128_R8
+        step = 16 * k
+        nfull = len(data) - len(data) % step
+        for idx in range(0, nfull, step):
+            ## g is XORed into the first block of the step
+            chunk = bytearray(data[idx:idx+step])
+            chunk[:16] = (g ^ int.from_bytes(chunk[:16], "big")).to_bytes(16, "big")
+            res = 0
+            for pos in range(15, -1, -1):
+                ## the bytes at position pos of all k blocks
+                acc = 0
+                for table, byte in zip(tables, chunk[pos::16]): acc ^= table[byte]
+                res = (res >>8) ^ red[res & 0xff] ^ acc
+            g = res
+        ## the remaining blocks one by one
+        return super().update(data[nfull:], g)
+
+### main ###
+def main(argv=sys.argv[1:]):
+    ## verifies the table driven multiplication against the bitwise one, and
+    ## compares their speed, then the aggregated form against the serial one
+    H = 0x66e94bd4ef8a2c3b884cfa59ca342b2e
+    nblocks = 2048
+    if len(argv) > 0: nblocks = int(argv[0])
+    ghash = GHash(H)
+
+    data = bytes((idx * 7 + 3) & 0xff for idx in range(16 * nblocks))
+    start = time.perf_counter()
+    g = 0
+    for idx in range(0, len(data), 16):
+        g = gf128_mult(g ^ int.from_bytes(data[idx:idx+16], "big"), H)
+    elapsed_bitwise = time.perf_counter() - start
+
+    start = time.perf_counter()
+    res = ghash.update(data)
+    elapsed_table = time.perf_counter() - start
+    if res != g: die("FAILED: table driven and bitwise GHASH differ")
+
+    size = len(data) / (1024*1024)
+    print(f"{nblocks} blocks, ghash {res:032x}")
+    print(f"bitwise: {elapsed_bitwise:.3f}s, {size/elapsed_bitwise:.2f} MB/s")
+    print(f"8-bit tables: {elapsed_table:.3f}s, {size/elapsed_table:.2f} MB/s")
+
+    ## aggregated reduction, k blocks per step
+    print("k\ttime [s]\tMB/s\tspeedup over serial")
+    for k in (2, 4, 8, 16):
+        aggregated = GHashAggregated(H, k)
+        start = time.perf_counter()
+        res_k = aggregated.update(data)
+        elapsed = time.perf_counter() - start
+        if res_k != res: die(f"FAILED: aggregated GHASH differs for k = {k}")
+        print(f"{k}\t{elapsed:.3f}\t\t{size/elapsed:.2f}\t{elapsed_table/elapsed:.2f}")
+
+### start ###
+if __name__ == '__main__':
+    main()
+    print("READY.")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# IMPORTANT: this implementation is meant as an educational demonstration only
+"""
+@author: Lothar Rubusch
+@email: L.Rubusch@gmx.ch
+@license: GPLv3
+
+AES over many blocks at once, by NumPy
+
+the blocks are rows of an (N, 16) array of bytes, each row holds the state of
+one block column by column, as in the bytearray engine of aes_core.py; every
+layer then works on all N blocks in one step
+
+ - SubBytes: fancy indexing into the S-box, sbox[state]
+ - ShiftRows: a permutation of the 16 columns, state[:, shift_rows]
+ - MixColumns: lookups into the multiplication tables of the constants,
+   XORed per row of the matrix
+ - AddRoundKey: XOR against the round key, broadcast over all rows
+
+only modes which encrypt independent blocks gain from this, i.e. ECB and CTR,
+and decryption in CBC, where all the blocks to XOR against are the known
+ciphertext; chained encryption still needs the previous block
+
+NumPy is optional, without it the module can be imported, but AESNumpy can not
+be instantiated (check HAVE_NUMPY)
+
+
+AES example
+
+Key:        000102030405060708090a0b0c0d0e0f
+Plaintext:  00112233445566778899aabbccddeeff
+Ciphertext: 69c4e0d86a7b0430d8cdb78070b4c55a
+"""
+
+import sys, time
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+from aes_core import AES, die
+
+
+class AESNumpy:
+    def __init__(self, aes):
+        ## params:
+        ## aes = an AES instance, for the key schedule and the tables
+        if not HAVE_NUMPY: die("AESNumpy needs numpy, which is not installed")
+        self._rounds = aes._rounds
+        self._roundkeys = np.frombuffer(b"".join(aes._roundkey_bytes), dtype=np.uint8).reshape(self._rounds+1, 16)
+
+        self._sbox = np.frombuffer(aes._sbox, dtype=np.uint8)
+        self._inv_sbox = np.frombuffer(aes._inv_sbox, dtype=np.uint8)
+        self._shift_rows = np.array(aes._shift_rows, dtype=np.intp)
+        self._inv_shift_rows = np.array(aes._inv_shift_rows, dtype=np.intp)
+
+        ## per row of the matrix, the multiplication tables of its constants
+        self._mix_columns = [[np.frombuffer(aes._gfmult_tables[const], dtype=np.uint8) for const in row]
+                             for row in aes._mix_columns__const_matrix]
+        self._inv_mix_columns = [[np.frombuffer(aes._gfmult_tables[const], dtype=np.uint8) for const in row]
+                                 for row in aes._mix_columns__inv_const_matrix]
+
+    ## layers, state is an (N, 16) array of uint8
+
+    def _mix_column(self, state, table):
+        ## params:
+        ## state = current states, one block per row
+        ## table = self._mix_columns or self._inv_mix_columns
+        cols = state.reshape(-1, 4, 4)
+        res = np.empty_like(cols)
+        for row in range(4):
+            mul = table[row]
+            res[:, :, row] = mul[0][cols[:, :, 0]] ^ mul[1][cols[:, :, 1]] ^ mul[2][cols[:, :, 2]] ^ mul[3][cols[:, :, 3]]
+        return res.reshape(-1, 16)
+
+    ## public interface
+
+    def encrypt_blocks(self, blocks):
+        ## params:
+        ## blocks = (N, 16) array of uint8, one plaintext block per row
+        ##
+        ## returns the (N, 16) array of ciphertext blocks
+        state = np.asarray(blocks, dtype=np.uint8) ^ self._roundkeys[0]
+        for rnd in range(1, self._rounds):
+            state = self._sbox[state]
+            state = state[:, self._shift_rows]
+            state = self._mix_column(state, self._mix_columns)
+            state ^= self._roundkeys[rnd]
+        state = self._sbox[state]
+        state = state[:, self._shift_rows]
+        state ^= self._roundkeys[self._rounds]
+        return state
+
+    def decrypt_blocks(self, blocks):
+        ## params:
+        ## blocks = (N, 16) array of uint8, one ciphertext block per row
+        ##
+        ## returns the (N, 16) array of plaintext blocks
+        state = np.asarray(blocks, dtype=np.uint8) ^ self._roundkeys[self._rounds]
+        state = state[:, self._inv_shift_rows]
+        state = self._inv_sbox[state]
+        for rnd in range(self._rounds-1, 0, -1):
+            state ^= self._roundkeys[rnd]
+            state = self._mix_column(state, self._inv_mix_columns)
+            state = state[:, self._inv_shift_rows]
+            state = self._inv_sbox[state]
+        state ^= self._roundkeys[0]
+        return state
+
+    def counter_blocks(self, IV, nblocks, start=0):
+        ## the counter blocks IV+start ... IV+start+nblocks-1 (mod 2^128), as
+        ## the CTR mode of the crypto056 script counts them
+        ##
+        ## params:
+        ## IV = the initiation vector as 128-bit number
+        ## nblocks = number of counter blocks
+        ## start = index of the first counter block
+        base = (IV + start) & ((1 <<128) - 1)
+        high = np.uint64(base >>64)
+        low = np.uint64(base & 0xffffffffffffffff)
+        lows = low + np.arange(nblocks, dtype=np.uint64)
+        ## carry into the upper half, where the lower half wrapped around
+        highs = high + (lows < low).astype(np.uint64)
+        blocks = np.empty((nblocks, 16), dtype=np.uint8)
+        blocks[:, :8] = highs.astype(">u8").view(np.uint8).reshape(nblocks, 8)
+        blocks[:, 8:] = lows.astype(">u8").view(np.uint8).reshape(nblocks, 8)
+        return blocks
+
+    def encrypt_ecb(self, data):
+        ## params:
+        ## data = bytes, a multiple of 16 bytes long
+        if 0 != len(data) % 16: die("ECB data must be a multiple of the blocksize")
+        blocks = np.frombuffer(data, dtype=np.uint8).reshape(-1, 16)
+        return self.encrypt_blocks(blocks).tobytes()
+
+    def decrypt_ecb(self, data):
+        ## params:
+        ## data = bytes, a multiple of 16 bytes long
+        if 0 != len(data) % 16: die("ECB data must be a multiple of the blocksize")
+        blocks = np.frombuffer(data, dtype=np.uint8).reshape(-1, 16)
+        return self.decrypt_blocks(blocks).tobytes()
+
+    def decrypt_cbc(self, data, IV):
+        ## CBC decryption, all blocks are decrypted at once, since all the
+        ## ciphertext blocks are known; then one XOR against the ciphertext
+        ## shifted by one block, IV || y[1] ... y[n-1]
+        ##
+        ## params:
+        ## data = bytes, a multiple of 16 bytes long
+        ## IV = the initiation vector as 128-bit number, or the last
+        ##      ciphertext block before data
+        ##
+        ## returns the plaintext, padding included
+        if 0 != len(data) % 16: die("CBC data must be a multiple of the blocksize")
+        blocks = np.frombuffer(data, dtype=np.uint8).reshape(-1, 16)
+        shifted = np.empty_like(blocks)
+        shifted[0] = np.frombuffer(IV.to_bytes(16, "big"), dtype=np.uint8)
+        shifted[1:] = blocks[:-1]
+        return (self.decrypt_blocks(blocks) ^ shifted).tobytes()
+
+    def crypt_ctr(self, data, IV, start=0):
+        ## CTR encryption and decryption alike, a last partial block takes the
+        ## leading bytes of its key stream block
+        ##
+        ## params:
+        ## data = bytes of any length
+        ## IV = the initiation vector as 128-bit number
+        ## start = index of the counter block of data[0]
+        nblocks = (len(data) + 15) // 16
+        keystream = self.encrypt_blocks(self.counter_blocks(IV, nblocks, start)).reshape(-1)
+        text = np.frombuffer(data, dtype=np.uint8)
+        return (text ^ keystream[:len(text)]).tobytes()
+
+
+### main ###
+def main(argv=sys.argv[1:]):
+    ## verifies the FIPS-197 example and compares the throughput against the
+    ## per-block T-table engine
+    inputkey = 0x000102030405060708090a0b0c0d0e0f
+    keylength = 128
+    nblocks = 4096
+    if len(argv) > 0: nblocks = int(argv[0])
+
+    aes = AES(inputkey, keylength, engine="ttable")
+    aes_np = AESNumpy(aes)
+
+    plaintext = np.frombuffer(bytes.fromhex("00112233445566778899aabbccddeeff"), dtype=np.uint8).reshape(1, 16)
+    ciphertext = aes_np.encrypt_blocks(plaintext)
+    print(f"ciphertext: {ciphertext.tobytes().hex()}")
+    if ciphertext.tobytes().hex() != "69c4e0d86a7b0430d8cdb78070b4c55a": die("FAILED: FIPS-197 example")
+    if aes_np.decrypt_blocks(ciphertext).tobytes() != plaintext.tobytes(): die("FAILED: decryption")
+
+    data = bytes(range(256)) * (nblocks // 16)
+    start = time.perf_counter()
+    encrypted = aes_np.encrypt_ecb(data)
+    elapsed_np = time.perf_counter() - start
+
+    start = time.perf_counter()
+    blockwise = b"".join(aes.encrypt(int.from_bytes(data[idx:idx+16], "big"), ishex=True).to_bytes(16, "big")
+                         for idx in range(0, len(data), 16))
+    elapsed_block = time.perf_counter() - start
+    if encrypted != blockwise: die("FAILED: numpy and per-block results differ")
+
+    size = len(data) / (1024*1024)
+    print(f"{len(data)//16} blocks")
+    print(f"numpy:     {elapsed_np:.3f}s, {size/elapsed_np:.2f} MB/s")
+    print(f"per block: {elapsed_block:.3f}s, {size/elapsed_block:.2f} MB/s")
+
+### start ###
+if __name__ == '__main__':
+    main()
+    print("READY.")
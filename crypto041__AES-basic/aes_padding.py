@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# IMPORTANT: this implementation is meant as an educational demonstration only
+"""
+@author: Lothar Rubusch
+@email: L.Rubusch@gmx.ch
+@license: GPLv3
+
+padding of the last block, for the block modes ECB, CBC and PCBC
+
+the padding works on bytes, in place on a bytearray, and only the final
+block is looked at or touched; the size of the padding is known from its
+last byte, or from the position of the marker byte, thus no bits are
+counted one by one
+
+ - PKCS#7 (RFC 5652): n bytes of value n, 1 <= n <= blocksize; an aligned
+   text gets a whole padding block
+     ... 41 42 43 05 05 05 05 05
+ - ISO/IEC 7816-4: the byte 0x80, i.e. a '1' bit, followed by 0x00 bytes;
+   an aligned text gets a whole padding block, this is the padding of the
+   AES scripts, see aes_core.pad()
+     ... 41 42 43 80 00 00 00 00
+ - ciphertext stealing: no padding, the ciphertext has the length of the
+   plaintext; the last, broken block borrows the missing bytes from the
+   ciphertext of the block before, thus it needs at least one full block;
+   here in the variant CBC-CS3 (addendum to NIST SP 800-38A), where the last
+   two ciphertext blocks are always swapped
+
+CBC-CS3 by zero padding
+
+the broken block p[n] of r bytes is padded by '0's, the data is encrypted
+in CBC as usual, then the last two blocks are swapped and the ciphertext is
+cut to the length of the plaintext
+
+    y'[n-1] = e[k](p[n-1] XOR y[n-2])
+    y'[n]   = e[k]((p[n] || 0) XOR y'[n-1])
+    output  = y[1] .. y[n-2] || y'[n] || y'[n-1] cut to r bytes
+
+the missing bytes of y'[n-1] are d[k](y'[n]) past r, because the '0's
+XORed them unchanged; restored, the ciphertext is decrypted in CBC as
+usual, see steal() and unsteal()
+
+
+sources
+https://datatracker.ietf.org/doc/html/rfc5652#section-6.3
+https://csrc.nist.gov/publications/detail/sp/800-38a/addendum/final
+"""
+
+import sys
+
+### tools ###
+
+def die(msg):
+    if 0 < len(msg): print(msg)
+    sys.exit(1)
+
+
+### PADDING ###
+
+PADDING_PKCS7 = "pkcs7"
+PADDING_ISO7816 = "iso7816"
+PADDING_CTS = "cts"
+
+## all schemes
+PADDINGS = (PADDING_PKCS7, PADDING_ISO7816, PADDING_CTS)
+
+def pad(buf, scheme=PADDING_ISO7816, nbytes=16):
+    ## pads the last block of buf in place
+    ##
+    ## params:
+    ## buf = the plaintext as bytearray, it is extended
+    ## scheme = the padding, see PADDINGS
+    ## nbytes = the block size in bytes
+    ##
+    ## returns buf; for ciphertext stealing a broken block is filled by '0's
+    ## up to the block size, the mode cuts the ciphertext back, see steal()
+    npad = nbytes - len(buf) % nbytes
+    if PADDING_PKCS7 == scheme:
+        if 255 < nbytes: die("PKCS#7 padding for blocks up to 255 bytes")
+        buf += bytes((npad,)) * npad
+    elif PADDING_ISO7816 == scheme:
+        buf.append(0x80)
+        buf += bytes(npad - 1)
+    elif PADDING_CTS == scheme:
+        if nbytes > len(buf): die("ciphertext stealing needs at least one full block")
+        if nbytes != npad: buf += bytes(npad)
+    else:
+        die(f"unknown padding '{scheme}'")
+    return buf
+
+def unpad(buf, scheme=PADDING_ISO7816, nbytes=16):
+    ## removes the padding from the last block of buf in place
+    ##
+    ## params:
+    ## buf = the decrypted text as bytearray, a multiple of nbytes, it is
+    ##       shortened
+    ## scheme = the padding, PADDING_PKCS7 or PADDING_ISO7816; ciphertext
+    ##          stealing is undone by the mode, see unsteal()
+    ## nbytes = the block size in bytes
+    ##
+    ## returns buf
+    if 0 == len(buf) or 0 != len(buf) % nbytes: die("padded text must be a multiple of the blocksize")
+    last = bytes(buf[-nbytes:])
+    if PADDING_PKCS7 == scheme:
+        npad = last[-1]
+        if not 0 < npad <= nbytes or last[-npad:] != bytes((npad,)) * npad: die("invalid padding")
+    elif PADDING_ISO7816 == scheme:
+        npad = nbytes - len(last.rstrip(b"\x00")) + 1
+        if npad > nbytes or 0x80 != last[-npad]: die("invalid padding")
+    else:
+        die(f"cannot remove padding '{scheme}'")
+    del buf[len(buf) - npad:]
+    return buf
+
+
+### CIPHERTEXT STEALING ###
+
+def steal(buf, length, nbytes=16):
+    ## CBC-CS3, turns the CBC ciphertext of the zero padded text into the
+    ## stolen one in place, the last two blocks swapped and cut to length
+    ##
+    ## params:
+    ## buf = the CBC ciphertext as bytearray, of the text padded by pad()
+    ## length = the length of the plaintext
+    ## nbytes = the block size in bytes
+    ##
+    ## returns buf
+    if 2 * nbytes <= len(buf):
+        buf[-2*nbytes:] = buf[-nbytes:] + buf[-2*nbytes:-nbytes]
+    del buf[length:]
+    return buf
+
+def unsteal(buf, decrypt_block, nbytes=16):
+    ## the inverse of steal(), restores the last two full ciphertext blocks
+    ## in place, thus buf is decrypted as plain CBC
+    ##
+    ## params:
+    ## buf = the CBC-CS3 ciphertext as bytearray, at least one block
+    ## decrypt_block = callable, decrypts one block given as bytes, without
+    ##                 the chaining
+    ## nbytes = the block size in bytes
+    ##
+    ## returns the length of the plaintext; the decrypted buf is cut to it
+    length = len(buf)
+    if nbytes > length: die("ciphertext stealing needs at least one full block")
+    rest = length % nbytes
+    if 0 == rest:
+        if 2 * nbytes <= length:
+            buf[-2*nbytes:] = buf[-nbytes:] + buf[-2*nbytes:-nbytes]
+        return length
+    nfull = length - rest
+    ## y'[n] ended up in front of the r bytes of y'[n-1]
+    last = bytes(buf[nfull-nbytes:nfull])
+    stolen = bytes(buf[nfull:]) + decrypt_block(last)[rest:]
+    buf[nfull-nbytes:] = stolen + last
+    return length
+
+
+### main ###
+def main(argv=sys.argv[1:]):
+    ## pads and unpads texts of all lengths around the blocks by the schemes
+    for scheme in (PADDING_PKCS7, PADDING_ISO7816):
+        for length in range(0, 49):
+            text = bytes(range(1, length + 1))
+            buf = pad(bytearray(text), scheme)
+            if 0 != len(buf) % 16 or len(buf) <= length: die(f"FAILED: {scheme} padding of {length} bytes")
+            if bytes(unpad(buf, scheme)) != text: die(f"FAILED: {scheme} unpadding of {length} bytes")
+        print(f"{scheme}: {pad(bytearray(b'ABC'), scheme, 8).hex()}")
+
+    ## CTS with the identity as cipher, i.e. CBC XORs each block into the
+    ## next; stolen and restored, the ciphertext must be the CBC one again
+    for length in range(16, 49):
+        buf = pad(bytearray(range(length)), PADDING_CTS)
+        for idx in range(16, len(buf)): buf[idx] ^= buf[idx-16]
+        padded = bytes(buf)
+        steal(buf, length)
+        if len(buf) != length: die(f"FAILED: ciphertext stealing of {length} bytes")
+        if length != unsteal(buf, lambda block: block) or bytes(buf) != padded: die(f"FAILED: restoring {length} bytes")
+    print(f"{PADDING_CTS}: ok")
+
+### start ###
+if __name__ == '__main__':
+    main()
+    print("READY.")
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# IMPORTANT: this implementation is meant as an educational demonstration only
+"""
+@author: Lothar Rubusch
+@email: L.Rubusch@gmx.ch
+@license: GPLv3
+
+AES over several processes, for the modes which encrypt independent blocks,
+i.e. CTR and ECB, and for CBC decryption
+
+the data is split into chunks aligned to the block size, which are dispatched
+to a pool of worker processes (concurrent.futures.ProcessPoolExecutor)
+
+ - the workers expand the key once, at start, and keep the cipher for all
+   their chunks (worker-side key schedule cache)
+ - the chunks are not pickled back and forth: input and output are shared
+   memory segments, or memory mapped files; a task only carries the name of
+   the buffers and the offset and length of its chunk, the worker reads its
+   chunk and writes the result to the same offset of the output, thus the
+   output is in order without reassembling it
+ - in CTR the chunk at offset starts with the counter block IV + offset/16,
+   in ECB the parent encrypts the padding block itself
+ - in CBC decryption the chunk at offset XORs against the ciphertext block
+   before it, which the worker reads from the input as well (or the IV)
+
+the workers run the NumPy engine (aes_numpy.py) if NumPy is installed, else
+the T-table engine block by block; main() measures the throughput per number
+of workers
+
+
+AES example
+
+Key:        000102030405060708090a0b0c0d0e0f
+Plaintext:  00112233445566778899aabbccddeeff
+Ciphertext: 69c4e0d86a7b0430d8cdb78070b4c55a
+"""
+
+import sys, os, time, mmap
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import aes_core
+from aes_core import AES, die
+import aes_padding
+from aes_padding import PADDING_ISO7816, PADDING_CTS
+from aes_numpy import AESNumpy, HAVE_NUMPY
+
+## bytes per task, a multiple of the block size
+CHUNKSIZE = 1024 * 1024
+
+
+### worker ###
+
+## the cipher of the worker process, set up once by _worker_init()
+_worker_aes = None
+_worker_aes_np = None
+
+def _worker_init(inputkey, keylength):
+    global _worker_aes, _worker_aes_np
+    _worker_aes = AES(inputkey, keylength, engine="ttable")
+    _worker_aes_np = AESNumpy(_worker_aes) if HAVE_NUMPY else None
+
+@contextmanager
+def _open_buffer(desc, writable=False):
+    ## attaches to a buffer of the parent
+    ##
+    ## params:
+    ## desc = ("shm", name) of a shared memory segment, or ("file", path)
+    ## writable = map a file for writing
+    kind, name = desc
+    if "shm" == kind:
+        ## the parent owns the segment and unlinks it, the worker only maps it
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            yield shm.buf
+        finally:
+            shm.close()
+    else:
+        with open(name, "r+b" if writable else "rb") as fd:
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ) as buf:
+                yield buf
+
+def _crypt_chunk(mode, src, dst, offset, length, IV):
+    ## runs in a worker: encrypts or decrypts the chunk [offset, offset+length)
+    ## of src into the same range of dst
+    ##
+    ## params:
+    ## mode = "ctr", "ecb-encrypt", "ecb-decrypt" or "cbc-decrypt"
+    ## src, dst = buffer descriptors, see _open_buffer()
+    ## offset = start of the chunk in bytes, a multiple of 16
+    ## length = size of the chunk in bytes
+    ## IV = the initiation vector for CTR and CBC
+    with _open_buffer(src) as inbuf, _open_buffer(dst, writable=True) as outbuf:
+        data = bytes(inbuf[offset:offset+length])
+        if "cbc-decrypt" == mode:
+            last_encryptblock = int.from_bytes(inbuf[offset-16:offset], "big") if offset > 0 else IV
+            if _worker_aes_np is not None:
+                res = _worker_aes_np.decrypt_cbc(data, last_encryptblock)
+            else:
+                decrypted = b"".join(_worker_aes.decrypt(int.from_bytes(data[idx:idx+16], "big"), asnum=True).to_bytes(16, "big")
+                                     for idx in range(0, length, 16))
+                res = aes_core.xor_bytes(decrypted, last_encryptblock.to_bytes(16, "big") + data[:-16])
+        elif "ctr" == mode:
+            if _worker_aes_np is not None:
+                res = _worker_aes_np.crypt_ctr(data, IV, start=offset // 16)
+            else:
+                nblocks = (length + 15) // 16
+                keystream = b"".join(_worker_aes.encrypt((IV + offset // 16 + idx) & ((1 <<128) - 1), ishex=True).to_bytes(16, "big")
+                                     for idx in range(nblocks))
+                res = aes_core.xor_bytes(data, keystream)
+        elif _worker_aes_np is not None:
+            res = _worker_aes_np.encrypt_ecb(data) if "ecb-encrypt" == mode else _worker_aes_np.decrypt_ecb(data)
+        else:
+            crypt = _worker_aes.encrypt if "ecb-encrypt" == mode else _worker_aes.decrypt
+            flag = {"ishex": True} if "ecb-encrypt" == mode else {"asnum": True}
+            res = b"".join(crypt(int.from_bytes(data[idx:idx+16], "big"), **flag).to_bytes(16, "big")
+                           for idx in range(0, length, 16))
+        outbuf[offset:offset+length] = res
+    return length
+
+
+### parent ###
+
+class ParallelAES:
+    def __init__(self, aes, workers=None, chunksize=CHUNKSIZE):
+        ## params:
+        ## aes = the AES instance holding the key
+        ## workers = number of worker processes, by default one per core
+        ## chunksize = bytes per task, a multiple of 16
+        if 0 >= chunksize or 0 != chunksize % 16: die("chunksize must be a multiple of the blocksize")
+        self._aes = aes
+        self._chunksize = chunksize
+        self._workers = workers if workers is not None else os.cpu_count()
+        ## the workers get the initial key, the leading words of the
+        ## expanded key, and expand it once at start
+        nwords = aes._keylength // 32
+        inputkey = 0
+        for word in aes._keys[:nwords]: inputkey = inputkey <<32 | word
+        self._executor = ProcessPoolExecutor(max_workers=self._workers, initializer=_worker_init,
+                                             initargs=(inputkey, aes._keylength))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown()
+
+    def _run(self, mode, src, dst, length, IV=0):
+        ## splits [0, length) into chunks and waits for all of them
+        futures = [self._executor.submit(_crypt_chunk, mode, src, dst, offset, min(self._chunksize, length - offset), IV)
+                   for offset in range(0, length, self._chunksize)]
+        for future in futures: future.result()
+
+    def _run_shm(self, mode, data, length, IV=0):
+        ## runs the first length bytes of data through shared memory
+        ##
+        ## returns the result as bytearray
+        if 0 == length: return bytearray()
+        src = shared_memory.SharedMemory(create=True, size=length)
+        dst = shared_memory.SharedMemory(create=True, size=length)
+        try:
+            src.buf[:length] = memoryview(data).cast("B")[:length]
+            self._run(mode, ("shm", src.name), ("shm", dst.name), length, IV)
+            return bytearray(dst.buf[:length])
+        finally:
+            for shm in (src, dst):
+                shm.close()
+                shm.unlink()
+
+    ## in memory
+
+    def crypt_ctr(self, data, IV):
+        ## CTR encryption and decryption alike
+        ##
+        ## params:
+        ## data = bytes or memoryview of any length
+        ## IV = the initiation vector, size 128 bit
+        return bytes(self._run_shm("ctr", data, len(data), IV))
+
+    def encrypt_ecb(self, data, padding=PADDING_ISO7816):
+        ## params:
+        ## data = bytes or memoryview of any length
+        ## padding = the padding of the last block, see aes_padding.py;
+        ##           no ciphertext stealing
+        ##
+        ## returns the ciphertext, padded as by the ECB stream interface
+        self._checkpadding(padding)
+        nfull = len(data) - len(data) % 16
+        res = self._run_shm("ecb-encrypt", data, nfull)
+        res += self._encrypt_padding(data[nfull:], padding)
+        return bytes(res)
+
+    def decrypt_ecb(self, data, padding=PADDING_ISO7816):
+        ## params:
+        ## data = the ciphertext, a multiple of 16 bytes
+        ## padding = the padding of the last block, see aes_padding.py
+        ##
+        ## returns the plaintext without the padding
+        self._checkpadding(padding)
+        if 0 == len(data) or 0 != len(data) % 16: die("ciphertext must be a multiple of the blocksize")
+        res = self._run_shm("ecb-decrypt", data, len(data))
+        return bytes(aes_padding.unpad(res, padding))
+
+    def decrypt_cbc(self, data, IV, padding=PADDING_ISO7816):
+        ## params:
+        ## data = the ciphertext, a multiple of 16 bytes
+        ## IV = the initiation vector, size 128 bit
+        ## padding = the padding of the last block, see aes_padding.py
+        ##
+        ## returns the plaintext without the padding
+        self._checkpadding(padding)
+        if 0 == len(data) or 0 != len(data) % 16: die("ciphertext must be a multiple of the blocksize")
+        res = self._run_shm("cbc-decrypt", data, len(data), IV)
+        return bytes(aes_padding.unpad(res, padding))
+
+    ## files, memory mapped
+
+    def crypt_ctr_file(self, inpath, outpath, IV):
+        ## CTR encryption and decryption alike, from file inpath to outpath
+        length = os.path.getsize(inpath)
+        self._create(outpath, length)
+        self._run("ctr", ("file", inpath), ("file", outpath), length, IV)
+
+    def encrypt_ecb_file(self, inpath, outpath, padding=PADDING_ISO7816):
+        self._checkpadding(padding)
+        length = os.path.getsize(inpath)
+        nfull = length - length % 16
+        self._create(outpath, nfull + 16)
+        self._run("ecb-encrypt", ("file", inpath), ("file", outpath), nfull)
+        with open(inpath, "rb") as fd:
+            fd.seek(nfull)
+            tail = fd.read()
+        with open(outpath, "r+b") as fd:
+            fd.seek(nfull)
+            fd.write(self._encrypt_padding(tail, padding))
+
+    def decrypt_ecb_file(self, inpath, outpath, padding=PADDING_ISO7816):
+        self._checkpadding(padding)
+        length = os.path.getsize(inpath)
+        if 0 == length or 0 != length % 16: die("ciphertext must be a multiple of the blocksize")
+        self._create(outpath, length)
+        self._run("ecb-decrypt", ("file", inpath), ("file", outpath), length)
+        self._unpad_file(outpath, length, padding)
+
+    def decrypt_cbc_file(self, inpath, outpath, IV, padding=PADDING_ISO7816):
+        self._checkpadding(padding)
+        length = os.path.getsize(inpath)
+        if 0 == length or 0 != length % 16: die("ciphertext must be a multiple of the blocksize")
+        self._create(outpath, length)
+        self._run("cbc-decrypt", ("file", inpath), ("file", outpath), length, IV)
+        self._unpad_file(outpath, length, padding)
+
+    def _checkpadding(self, padding):
+        ## ciphertext stealing needs the whole text, see aes_padding.py
+        if PADDING_CTS == padding: die("no ciphertext stealing in the parallel engine")
+
+    def _unpad_file(self, path, length, padding=PADDING_ISO7816):
+        ## drops the padding from the end of the decrypted file, only the
+        ## last block is read
+        with open(path, "r+b") as fd:
+            fd.seek(length - 16)
+            tail = aes_padding.unpad(bytearray(fd.read(16)), padding)
+            fd.truncate(length - 16 + len(tail))
+
+    def _create(self, path, length):
+        ## creates the output file at its final size, for the workers to map
+        with open(path, "wb") as fd:
+            fd.truncate(length)
+
+    def _encrypt_padding(self, tail, padding=PADDING_ISO7816):
+        ## the last, padded block is encrypted by the parent
+        block = aes_padding.pad(bytearray(tail), padding)
+        return self._aes.encrypt(int.from_bytes(block, "big"), ishex=True).to_bytes(16, "big")
+
+
+### main ###
+def main(argv=sys.argv[1:]):
+    ## measures the CTR throughput per number of workers, and verifies the
+    ## results against a single process
+    inputkey = 0x000102030405060708090a0b0c0d0e0f
+    keylength = 128
+    IV = 0x0123456789abcdef0123456789abcdef
+    size = 16 * 1024 * 1024
+    if len(argv) > 0: size = int(argv[0]) * 1024 * 1024
+
+    aes = AES(inputkey, keylength)
+    data = os.urandom(size)
+
+    ncores = os.cpu_count()
+    counts = sorted(set([1, 2, 4, 8, ncores]))
+    print(f"{size // (1024*1024)} MB, {ncores} cores, {'numpy' if HAVE_NUMPY else 'T-table'} engine")
+    print("workers\ttime [s]\tMB/s\tspeedup")
+    reference = None
+    elapsed_one = None
+    for workers in counts:
+        with ParallelAES(aes, workers) as parallel:
+            ## warm up, to start the workers
+            parallel.crypt_ctr(bytes(16), IV)
+            start = time.perf_counter()
+            res = parallel.crypt_ctr(data, IV)
+            elapsed = time.perf_counter() - start
+            if parallel.crypt_ctr(res, IV) != data: die("FAILED: CTR round trip")
+            if parallel.decrypt_ecb(parallel.encrypt_ecb(data[:4100])) != data[:4100]: die("FAILED: ECB round trip")
+            if parallel.decrypt_ecb(parallel.encrypt_ecb(data[:4096], aes_padding.PADDING_PKCS7), aes_padding.PADDING_PKCS7) != data[:4096]:
+                die("FAILED: ECB round trip, PKCS#7")
+        if reference is None: reference, elapsed_one = res, elapsed
+        elif res != reference: die("FAILED: results differ by the number of workers")
+        print(f"{workers}\t{elapsed:.3f}\t\t{size / (1024*1024) / elapsed:.2f}\t{elapsed_one / elapsed:.2f}")
+
+### start ###
+if __name__ == '__main__':
+    main()
+    print("READY.")
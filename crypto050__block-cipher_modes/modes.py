@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# IMPORTANT: this implementation is meant as an educational demonstration only
+"""
+@author: Lothar Rubusch
+@email: L.Rubusch@gmx.ch
+@license: GPLv3
+
+modes of operation for any block cipher
+
+the mode scripts crypto051..crypto058 implement the modes on top of AES; here
+the modes ECB, CBC, OFB, CFB, CTR and PCBC are written once, against a small
+block cipher protocol, and work with AES, DES and PRESENT alike
+
+block cipher protocol
+
+ blocksize          the block size in bytes
+ encrypt_block(x)   encrypts one block, given and returned as number
+ decrypt_block(y)   decrypts one block
+ encrypt_blocks(d)  optional batch hook, encrypts bytes of several blocks at
+                    once and returns bytes of the same length
+ decrypt_blocks(d)  optional batch hook, the same for decryption
+
+the modes take the batch hooks where the blocks are independent, i.e. ECB,
+the key stream of CTR, and decryption in CBC and CFB, where all blocks to
+XOR against are the known ciphertext; OFB, and encryption in CBC, CFB and
+PCBC are chained and go block by block
+
+ECB, CBC and PCBC pad the last block by a '1' bit followed by '0's, a whole
+padding block if the data is aligned, as the AES scripts do; alternatively
+by PKCS#7, or, in ECB and CBC, by ciphertext stealing, see
+crypto041__AES-basic/aes_padding.py; OFB, CFB and CTR are stream modes, a
+last broken block takes the leading bytes of its key stream block; the IV is
+a number of the block size
+
+
+AES-CBC example [SP 800-38A, F.2.1]
+
+Key:        2b7e151628aed2a6abf7158809cf4f3c
+IV:         000102030405060708090a0b0c0d0e0f
+Plaintext:  6bc1bee22e409f96e93d7e117393172a
+Ciphertext: 7649abac8119b246cee98e9b12e9197d
+
+
+sources
+http://en.wikipedia.org/wiki/Block_cipher_modes_of_operation
+http://csrc.nist.gov/publications/nistpubs/800-38a/sp800-38a.pdf
+"""
+
+import sys, os
+
+## the block ciphers
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "crypto041__AES-basic"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "crypto034__DES"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "crypto035__PRESENT"))
+import aes_core
+from aes_core import die
+import aes_padding
+from aes_padding import PADDING_ISO7816, PADDING_CTS
+from aes_numpy import AESNumpy, HAVE_NUMPY
+from aes_bitslice import AESBitslice
+from des import DES
+from present import Present
+
+
+### ciphers ###
+
+class AESCipher:
+    ## AES by the block cipher protocol
+    blocksize = 16
+
+    def __init__(self, aes):
+        ## params:
+        ## aes = an AES instance (aes_core.py)
+        self._aes = aes
+
+    def encrypt_block(self, block):
+        return self._aes.encrypt(block, ishex=True)
+
+    def decrypt_block(self, block):
+        return self._aes.decrypt(block, asnum=True)
+
+class AESNumpyCipher(AESCipher):
+    ## AES with the batch hooks of the NumPy engine (aes_numpy.py)
+    def __init__(self, aes):
+        super().__init__(aes)
+        self._aes_np = AESNumpy(aes)
+
+    def encrypt_blocks(self, data):
+        return self._aes_np.encrypt_ecb(bytes(data))
+
+    def decrypt_blocks(self, data):
+        return self._aes_np.decrypt_ecb(bytes(data))
+
+class AESBitsliceCipher(AESCipher):
+    ## AES with the batch hook of the bitsliced engine (aes_bitslice.py),
+    ## which only encrypts
+    def __init__(self, aes):
+        super().__init__(aes)
+        self._bitslice = AESBitslice(aes)
+
+    def encrypt_blocks(self, data):
+        return self._bitslice.encrypt_bytes(bytes(data))
+
+class DESCipher:
+    ## DES by the block cipher protocol
+    blocksize = 8
+
+    def __init__(self, des):
+        ## params:
+        ## des = a DES instance (crypto034__DES/des.py)
+        self._des = des
+
+    def encrypt_block(self, block):
+        return self._des.encrypt(block, ishex=True)
+
+    def decrypt_block(self, block):
+        return self._des.crypto(block, False)
+
+class PresentCipher:
+    ## PRESENT by the block cipher protocol
+    blocksize = 8
+
+    def __init__(self, present):
+        ## params:
+        ## present = a Present instance (crypto035__PRESENT/present.py)
+        self._present = present
+
+    def encrypt_block(self, block):
+        return self._present.encrypt(block, ishex=True)
+
+    def decrypt_block(self, block):
+        return self._present.decrypt(block, asnum=True)
+
+
+### modes ###
+
+class BlockModes:
+    def __init__(self, cipher):
+        ## params:
+        ## cipher = a block cipher by the protocol above
+        self._cipher = cipher
+        self._blocksize = cipher.blocksize
+        self._mask = (1 <<(8 * cipher.blocksize)) - 1
+        ## the batch hooks, None if the cipher has none
+        self._encrypt_blocks = getattr(cipher, "encrypt_blocks", None)
+        self._decrypt_blocks = getattr(cipher, "decrypt_blocks", None)
+
+    ## utilities
+
+    def _blocks(self, data):
+        ## the blocks of data as numbers, a last broken block as it is
+        nbytes = self._blocksize
+        return [int.from_bytes(data[idx:idx+nbytes], "big") for idx in range(0, len(data), nbytes)]
+
+    def _tobytes(self, blocks):
+        nbytes = self._blocksize
+        return b"".join(block.to_bytes(nbytes, "big") for block in blocks)
+
+    def _encrypt_many(self, data):
+        ## encrypts bytes of full blocks, by the batch hook if there is one
+        if 0 == len(data): return b""
+        if self._encrypt_blocks is not None: return self._encrypt_blocks(data)
+        encrypt = self._cipher.encrypt_block
+        return self._tobytes([encrypt(block) for block in self._blocks(data)])
+
+    def _decrypt_many(self, data):
+        if 0 == len(data): return b""
+        if self._decrypt_blocks is not None: return self._decrypt_blocks(data)
+        decrypt = self._cipher.decrypt_block
+        return self._tobytes([decrypt(block) for block in self._blocks(data)])
+
+    def _pad(self, data, padding=PADDING_ISO7816):
+        ## the data with the last block padded, see aes_padding.pad()
+        return aes_padding.pad(bytearray(data), padding, self._blocksize)
+
+    def _unpad(self, data, padding=PADDING_ISO7816):
+        ## params:
+        ## data = the decrypted text as bytearray, unpadded in place
+        return bytes(aes_padding.unpad(data, padding, self._blocksize))
+
+    def _checkdata(self, data):
+        if 0 == len(data) or 0 != len(data) % self._blocksize: die("ciphertext must be a multiple of the blocksize")
+
+    def _checkpadding(self, padding):
+        ## ciphertext stealing only in ECB and CBC
+        if PADDING_CTS == padding: die("no ciphertext stealing in this mode")
+
+    ## ECB
+
+    def encrypt_ecb(self, plaintext, padding=PADDING_ISO7816):
+        ## params:
+        ## plaintext = bytes of any length, for ciphertext stealing at least
+        ##             one block
+        ## padding = the padding of the last block, see aes_padding.py
+        if PADDING_CTS == padding: return self._encrypt_ecb_cts(plaintext)
+        return self._encrypt_many(self._pad(plaintext, padding))
+
+    def decrypt_ecb(self, ciphertext, padding=PADDING_ISO7816):
+        if PADDING_CTS == padding: return self._decrypt_ecb_cts(ciphertext)
+        self._checkdata(ciphertext)
+        return self._unpad(bytearray(self._decrypt_many(ciphertext)), padding)
+
+    def _encrypt_ecb_cts(self, plaintext):
+        ## ECB ciphertext stealing, the broken block p[n] of r bytes is
+        ## filled up by the tail of y' = e[k](p[n-1]), which is cut to r bytes
+        ##
+        ##   y[n-1] = e[k](p[n] || y'[r:]),  y[n] = y'[:r]
+        nbytes = self._blocksize
+        if nbytes > len(plaintext): die("ciphertext stealing needs at least one full block")
+        rest = len(plaintext) % nbytes
+        nfull = len(plaintext) - rest
+        out = bytearray(self._encrypt_many(plaintext[:nfull]))
+        if 0 < rest:
+            last = bytes(out[-nbytes:])
+            out[-nbytes:] = self._encrypt_many(bytes(plaintext[nfull:]) + last[rest:])
+            out += last[:rest]
+        return bytes(out)
+
+    def _decrypt_ecb_cts(self, ciphertext):
+        nbytes = self._blocksize
+        if nbytes > len(ciphertext): die("ciphertext stealing needs at least one full block")
+        rest = len(ciphertext) % nbytes
+        nfull = len(ciphertext) - rest
+        out = bytearray(self._decrypt_many(ciphertext[:nfull]))
+        if 0 < rest:
+            ## the last full block decrypts to p[n] || y'[r:]
+            last = bytes(out[-nbytes:])
+            out[-nbytes:] = self._decrypt_many(bytes(ciphertext[nfull:]) + last[rest:])
+            out += last[:rest]
+        return bytes(out)
+
+    ## CBC
+
+    def encrypt_cbc(self, plaintext, IV, padding=PADDING_ISO7816):
+        ## params:
+        ## plaintext = bytes of any length, for ciphertext stealing at least
+        ##             one block
+        ## IV = the initiation vector, a number of the block size
+        ## padding = the padding of the last block, see aes_padding.py; the
+        ##           ciphertext stealing is CBC-CS3
+        encrypt = self._cipher.encrypt_block
+        last_encryptblock = IV
+        cipherblocks = []
+        for block in self._blocks(self._pad(plaintext, padding)):
+            last_encryptblock = encrypt(block ^ last_encryptblock)
+            cipherblocks.append(last_encryptblock)
+        if PADDING_CTS == padding:
+            return bytes(aes_padding.steal(bytearray(self._tobytes(cipherblocks)), len(plaintext), self._blocksize))
+        return self._tobytes(cipherblocks)
+
+    def decrypt_cbc(self, ciphertext, IV, padding=PADDING_ISO7816):
+        ## all blocks are decrypted at once, then XORed against the
+        ## ciphertext shifted by one block, IV || y[1] .. y[n-1]
+        if PADDING_CTS == padding:
+            ## the last two blocks restored, it is plain CBC
+            ciphertext = bytearray(ciphertext)
+            length = aes_padding.unsteal(ciphertext, self._decrypt_many, self._blocksize)
+        self._checkdata(ciphertext)
+        shifted = IV.to_bytes(self._blocksize, "big") + bytes(ciphertext[:-self._blocksize])
+        decrypted = aes_core.xor_bytes(self._decrypt_many(bytes(ciphertext)), shifted)
+        if PADDING_CTS == padding: return decrypted[:length]
+        return self._unpad(bytearray(decrypted), padding)
+
+    ## PCBC
+
+    def encrypt_pcbc(self, plaintext, IV, padding=PADDING_ISO7816):
+        self._checkpadding(padding)
+        encrypt = self._cipher.encrypt_block
+        last_block = IV
+        cipherblocks = []
+        for block in self._blocks(self._pad(plaintext, padding)):
+            cipherblock = encrypt(block ^ last_block)
+            cipherblocks.append(cipherblock)
+            ## propagating, XOR of plaintext and ciphertext
+            last_block = cipherblock ^ block
+        return self._tobytes(cipherblocks)
+
+    def decrypt_pcbc(self, ciphertext, IV, padding=PADDING_ISO7816):
+        ## the XOR depends on the previous plaintext, thus it is chained, but
+        ## the decryption of the blocks is not
+        self._checkpadding(padding)
+        self._checkdata(ciphertext)
+        decrypted = self._blocks(self._decrypt_many(ciphertext))
+        last_block = IV
+        textblocks = []
+        for cipherblock, block in zip(self._blocks(ciphertext), decrypted):
+            textblock = block ^ last_block
+            textblocks.append(textblock)
+            last_block = cipherblock ^ textblock
+        return self._unpad(bytearray(self._tobytes(textblocks)), padding)
+
+    ## OFB
+
+    def crypt_ofb(self, data, IV):
+        ## OFB encryption and decryption alike
+        encrypt = self._cipher.encrypt_block
+        curr_block = IV
+        keystream = []
+        for idx in range(0, len(data), self._blocksize):
+            curr_block = encrypt(curr_block)
+            keystream.append(curr_block)
+        return aes_core.xor_bytes(data, self._tobytes(keystream))
+
+    ## CFB
+
+    def encrypt_cfb(self, plaintext, IV):
+        encrypt = self._cipher.encrypt_block
+        nbytes = self._blocksize
+        last_block = IV
+        out = []
+        for idx in range(0, len(plaintext), nbytes):
+            ciphered = aes_core.xor_bytes(plaintext[idx:idx+nbytes], encrypt(last_block).to_bytes(nbytes, "big"))
+            out.append(ciphered)
+            last_block = int.from_bytes(ciphered, "big")
+        return b"".join(out)
+
+    def decrypt_cfb(self, ciphertext, IV):
+        ## the key stream is the encrypted ciphertext shifted by one block,
+        ## thus all known in advance; a last broken block is not fed back
+        nbytes = self._blocksize
+        nfull = len(ciphertext) - len(ciphertext) % nbytes
+        ## the blocks to encrypt: IV, y[1], ..., up to the last block
+        shifted = IV.to_bytes(nbytes, "big") + bytes(ciphertext[:nfull])
+        if nfull == len(ciphertext): shifted = shifted[:len(shifted) - nbytes]
+        return aes_core.xor_bytes(ciphertext, self._encrypt_many(shifted))
+
+    ## CTR
+
+    def crypt_ctr(self, data, IV):
+        ## CTR encryption and decryption alike, counting IV, IV+1, ... modulo
+        ## the block size
+        nbytes = self._blocksize
+        nblocks = (len(data) + nbytes - 1) // nbytes
+        counters = self._tobytes([(IV + counter) & self._mask for counter in range(nblocks)])
+        return aes_core.xor_bytes(data, self._encrypt_many(counters))
+
+
+### main ###
+def main(argv=sys.argv[1:]):
+    ## verifies the modes against the SP 800-38A examples of AES, then runs
+    ## every mode with every cipher forth and back
+    key = 0x2b7e151628aed2a6abf7158809cf4f3c
+    IV = 0x000102030405060708090a0b0c0d0e0f
+    plaintext = bytes.fromhex("6bc1bee22e409f96e93d7e117393172aae2d8a571e03ac9c9eb76fac45af8e51")
+    modes = BlockModes(AESCipher(aes_core.AES(key, 128)))
+    expected = {"cbc": "7649abac8119b246cee98e9b12e9197d5086cb9b507219ee95db113a917678b2",
+                "ofb": "3b3fd92eb72dad20333449f8e83cfb4a7789508d16918f03f53c52dac54ed825",
+                "cfb": "3b3fd92eb72dad20333449f8e83cfb4ac8a64537a0b3a93fcde3cdad9f1ce58b",
+                "ctr": "874d6191b620e3261bef6864990db6ce9806f66b7970fdff8617187bb9fffdff"}
+    results = {"cbc": modes.encrypt_cbc(plaintext, IV)[:32],
+               "ofb": modes.crypt_ofb(plaintext, IV),
+               "cfb": modes.encrypt_cfb(plaintext, IV),
+               "ctr": modes.crypt_ctr(plaintext, 0xf0f1f2f3f4f5f6f7f8f9fafbfcfdfeff)}
+    for name in expected:
+        print(f"AES-{name.upper()}: {results[name].hex()}")
+        if results[name].hex() != expected[name]: die(f"FAILED: AES-{name.upper()} example")
+
+    aes = aes_core.AES(0x000102030405060708090a0b0c0d0e0f, 128)
+    ciphers = [("AES", AESCipher(aes)),
+               ("AES, bitsliced", AESBitsliceCipher(aes)),
+               ("DES", DESCipher(DES(0x133457799bbcdff1))),
+               ("PRESENT", PresentCipher(Present(0xbbbb55555555eeeeffff)))]
+    if HAVE_NUMPY: ciphers.insert(1, ("AES, numpy", AESNumpyCipher(aes)))
+    plaintext = "Cantando espalharei por toda parte, Se a tanto me ajudar o engenho e arte.".encode("utf-8")
+    print("")
+    for name, cipher in ciphers:
+        modes = BlockModes(cipher)
+        IV = int.from_bytes(os.urandom(cipher.blocksize), "big")
+        roundtrips = {"ECB": modes.decrypt_ecb(modes.encrypt_ecb(plaintext)),
+                      "CBC": modes.decrypt_cbc(modes.encrypt_cbc(plaintext, IV), IV),
+                      "PCBC": modes.decrypt_pcbc(modes.encrypt_pcbc(plaintext, IV), IV),
+                      "OFB": modes.crypt_ofb(modes.crypt_ofb(plaintext, IV), IV),
+                      "CFB": modes.decrypt_cfb(modes.encrypt_cfb(plaintext, IV), IV),
+                      "CTR": modes.crypt_ctr(modes.crypt_ctr(plaintext, IV), IV)}
+        ## the other paddings, the plaintext is not aligned for any block size
+        for padding in (aes_padding.PADDING_PKCS7, PADDING_CTS):
+            roundtrips[f"ECB/{padding}"] = modes.decrypt_ecb(modes.encrypt_ecb(plaintext, padding), padding)
+            roundtrips[f"CBC/{padding}"] = modes.decrypt_cbc(modes.encrypt_cbc(plaintext, IV, padding), IV, padding)
+        if len(plaintext) != len(modes.encrypt_cbc(plaintext, IV, PADDING_CTS)): die(f"FAILED: {name} CBC-CS3 length")
+        for mode, decrypted in roundtrips.items():
+            if decrypted != plaintext: die(f"FAILED: {name} {mode}")
+        print(f"{name}: {', '.join(roundtrips)} ok")
+
+### start ###
+if __name__ == '__main__':
+    main()
+    print("READY.")
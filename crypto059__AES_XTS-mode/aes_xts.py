@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# IMPORTANT: this implementation is meant as an educational demonstration only
+"""
+@author: Lothar Rubusch
+@email: L.Rubusch@gmx.ch
+@license: GPLv3
+
+AES (american encryption standard)
+128-bit block size
+key lengths of 128 bit or 256 bit, XTS takes two keys of this length
+
+
+XTS - XEX-based Tweaked-codebook mode with ciphertext Stealing (IEEE 1619)
+
+                   sector i
+                      |
+                      V
+                  +-------+
+           k2 --->| e()   |---> T = e[k2](i) * alpha^j
+                  +-------+           |
+                                      +-----------------+
+                                      |                 |
+                                      V    +-----+      V
+                           x[j] ---> XOR ->| e() |---> XOR ---> y[j]
+                                           +-----+
+                                              A
+                                              |
+                                              k1
+
+ * for disk encryption, a data unit (sector) is encrypted on its own, addressed
+   by its number, thus any sector can be read and written at random
+ * the tweak T depends on the sector and on the position j of the block
+   inside the sector, equal blocks encrypt differently everywhere on the disk
+ * the ciphertext has the size of the plaintext, no IV and no padding are
+   stored; a last broken block is handled by ciphertext stealing
+ * the blocks of a sector, and all sectors, are independent, thus encryption
+   and decryption are parallelizable; the blocks go to the NumPy engine in one
+   batch, and an image is split into runs of sectors for worker processes
+   which map the image file (encrypt_image)
+
+theory
+
+let e() be a block cipher of block size 128bit, let k = k1 || k2 be the key,
+and i the number of the sector, as 128-bit little endian number
+
+tweak: T[j] = e[k2](i) * alpha^j   ; in GF(2^128), little endian, reduced by
+                                   ; x^128 + x^7 + x^2 + x + 1
+encryption: y[j] = e[k1](x[j] XOR T[j]) XOR T[j]
+decryption: x[j] = e[k1]^{-1}(y[j] XOR T[j]) XOR T[j]
+
+ciphertext stealing, when the sector ends with a broken block x[m] of b bytes:
+CC = e[k1](x[m-1] XOR T[m-1]) XOR T[m-1], y[m] = the first b bytes of CC, and
+y[m-1] is the encryption of x[m] || the remaining bytes of CC by T[m]
+
+
+AES-XTS example [IEEE 1619-2007, vector 2]
+
+Key1:       11111111111111111111111111111111
+Key2:       22222222222222222222222222222222
+Sector:     3333333333
+Plaintext:  4444444444444444444444444444444444444444444444444444444444444444
+Ciphertext: c454185e6a16936e39334038acef838bfb186fff7480adc4289382ecd6d394f0
+
+
+sources
+IEEE Std 1619-2007, Standard for Cryptographic Protection of Data on
+Block-Oriented Storage Devices
+http://csrc.nist.gov/publications/nistpubs/800-38E/nist-sp-800-38E.pdf
+http://en.wikipedia.org/wiki/Disk_encryption_theory
+"""
+
+import sys, os, time, mmap
+from concurrent.futures import ProcessPoolExecutor
+
+## the AES core, shared by the AES scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "crypto041__AES-basic"))
+import aes_core
+from aes_core import AES, die
+from aes_numpy import AESNumpy, HAVE_NUMPY
+
+## the sector, the data unit, in bytes
+SECTORSIZE = 512
+
+## sectors per task of the image mode, 1MB at 512 byte sectors
+SECTORS_PER_TASK = 2048
+
+
+class XTS:
+    def __init__(self, inputkey, keylength, sectorsize=SECTORSIZE):
+        ## params:
+        ## inputkey = the XTS key k1 || k2 as hex number, of 2*keylength bit
+        ## keylength = 128 or 256 bit, the length of k1 and of k2
+        ## sectorsize = the size of a data unit in bytes, at least 16
+        if keylength not in (128, 256): die("XTS is defined for AES-128 and AES-256")
+        if 16 > sectorsize: die("a sector has at least one block")
+        self._inputkey = inputkey
+        self._keylength = keylength
+        self._sectorsize = sectorsize
+        self._aes = AES(inputkey >>keylength, keylength)
+        self._tweak_aes = AES(inputkey & ((1 <<keylength) - 1), keylength)
+        ## the blocks of a sector, and the tweaks of many sectors, are
+        ## encrypted in batches by the NumPy engine, if available
+        self._aes_np = AESNumpy(self._aes) if HAVE_NUMPY else None
+        self._tweak_aes_np = AESNumpy(self._tweak_aes) if HAVE_NUMPY else None
+
+    ## utilities
+
+    def _ecb(self, aes, aes_np, data, isencrypt=True):
+        ## encrypts or decrypts the full blocks of data, in one batch if the
+        ## NumPy engine is available
+        if 0 == len(data): return b""
+        if aes_np is not None:
+            return aes_np.encrypt_ecb(data) if isencrypt else aes_np.decrypt_ecb(data)
+        if isencrypt:
+            return b"".join(aes.encrypt(int.from_bytes(data[idx:idx+16], "big"), ishex=True).to_bytes(16, "big")
+                            for idx in range(0, len(data), 16))
+        return b"".join(aes.decrypt(int.from_bytes(data[idx:idx+16], "big"), asnum=True).to_bytes(16, "big")
+                        for idx in range(0, len(data), 16))
+
+    def _tweakstreams(self, first_sector, nsectors, nblocks):
+        ## the tweaks T[0] .. T[nblocks-1] of each of the sectors, as bytes
+        ##
+        ## params:
+        ## first_sector = number of the first sector
+        ## nsectors = number of consecutive sectors
+        ## nblocks = number of tweaks per sector
+        sectors = b"".join((first_sector + idx).to_bytes(16, "little") for idx in range(nsectors))
+        initial = self._ecb(self._tweak_aes, self._tweak_aes_np, sectors)
+        streams = []
+        for idx in range(0, len(initial), 16):
+            ## multiplication by alpha, a shift left of the little endian
+            ## number, reduced by 0x87 if the top bit falls off
+            tweak = int.from_bytes(initial[idx:idx+16], "little")
+            for j in range(nblocks):
+                streams.append(tweak.to_bytes(16, "little"))
+                tweak <<= 1
+                if tweak >>128: tweak ^= (1 <<128) | 0x87
+        return b"".join(streams)
+
+    def _xex(self, data, tweaks, isencrypt):
+        ## y = e[k1](x XOR T) XOR T for all full blocks of data at once
+        whitened = aes_core.xor_bytes(data, tweaks)
+        return aes_core.xor_bytes(self._ecb(self._aes, self._aes_np, whitened, isencrypt), tweaks)
+
+    ## sectors
+
+    def encrypt_sector(self, data, sector_no):
+        ## params:
+        ## data = the plaintext of one sector, any length of at least 16 bytes
+        ## sector_no = the number of the sector
+        ##
+        ## returns the ciphertext, of the length of the plaintext
+        return self._crypt_sector(bytes(data), sector_no, True)
+
+    def decrypt_sector(self, data, sector_no):
+        return self._crypt_sector(bytes(data), sector_no, False)
+
+    def _crypt_sector(self, data, sector_no, isencrypt):
+        if 16 > len(data): die("a sector has at least one block")
+        nfull = len(data) // 16
+        rest = len(data) % 16
+        tweaks = self._tweakstreams(sector_no, 1, nfull + (1 if rest else 0))
+        if 0 == rest: return self._xex(data, tweaks, isencrypt)
+
+        ## ciphertext stealing, the last full block m-1 and the broken block
+        ## m are processed by the tweaks T[m-1] and T[m], swapped in
+        ## decryption
+        head = 16 * (nfull - 1)
+        tweak_full = tweaks[head:head+16]
+        tweak_last = tweaks[head+16:head+32]
+        res = self._xex(data[:head], tweaks[:head], isencrypt)
+        block = self._xex(data[head:head+16], tweak_full if isencrypt else tweak_last, isencrypt)
+        stolen = self._xex(data[head+16:] + block[rest:], tweak_last if isencrypt else tweak_full, isencrypt)
+        return res + stolen + block[:rest]
+
+    def crypt_sectors(self, data, first_sector, isencrypt=True):
+        ## encrypts or decrypts consecutive sectors at once
+        ##
+        ## params:
+        ## data = the sectors, only the last one may be short
+        ## first_sector = number of the first sector
+        ## isencrypt = encrypt, else decrypt
+        sectorsize = self._sectorsize
+        nfull = len(data) // sectorsize
+        res = []
+        if 0 == sectorsize % 16 and 0 < nfull:
+            ## all full sectors in one batch
+            tweaks = self._tweakstreams(first_sector, nfull, sectorsize // 16)
+            res.append(self._xex(bytes(data[:nfull*sectorsize]), tweaks, isencrypt))
+        else:
+            nfull = 0
+        for offset in range(nfull * sectorsize, len(data), sectorsize):
+            res.append(self._crypt_sector(bytes(data[offset:offset+sectorsize]), first_sector + offset // sectorsize, isencrypt))
+        return b"".join(res)
+
+    ## disk images
+
+    def encrypt_image(self, inpath, outpath, workers=None, first_sector=0):
+        ## encrypts the image inpath into outpath, by worker processes which
+        ## memory map both files
+        ##
+        ## params:
+        ## workers = number of worker processes, by default one per core
+        ## first_sector = number of the first sector of the image
+        self._crypt_image(inpath, outpath, workers, first_sector, True)
+
+    def decrypt_image(self, inpath, outpath, workers=None, first_sector=0):
+        self._crypt_image(inpath, outpath, workers, first_sector, False)
+
+    def _crypt_image(self, inpath, outpath, workers, first_sector, isencrypt):
+        length = os.path.getsize(inpath)
+        if 0 < length % self._sectorsize and 16 > length % self._sectorsize: die("the last sector has less than one block")
+        with open(outpath, "wb") as fd:
+            fd.truncate(length)
+        if 0 == length: return
+        step = SECTORS_PER_TASK * self._sectorsize
+        with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init,
+                                 initargs=(self._inputkey, self._keylength, self._sectorsize)) as executor:
+            futures = [executor.submit(_crypt_image_chunk, inpath, outpath, offset, min(step, length - offset),
+                                       first_sector + offset // self._sectorsize, isencrypt)
+                       for offset in range(0, length, step)]
+            for future in futures: future.result()
+
+
+### worker ###
+
+## the XTS instance of the worker process, set up once by _worker_init()
+_worker_xts = None
+
+def _worker_init(inputkey, keylength, sectorsize):
+    global _worker_xts
+    _worker_xts = XTS(inputkey, keylength, sectorsize)
+
+def _crypt_image_chunk(inpath, outpath, offset, length, first_sector, isencrypt):
+    ## runs in a worker: the sectors [offset, offset+length) of the image
+    with open(inpath, "rb") as infd, open(outpath, "r+b") as outfd:
+        with mmap.mmap(infd.fileno(), 0, access=mmap.ACCESS_READ) as inbuf, \
+             mmap.mmap(outfd.fileno(), 0, access=mmap.ACCESS_WRITE) as outbuf:
+            outbuf[offset:offset+length] = _worker_xts.crypt_sectors(inbuf[offset:offset+length], first_sector, isencrypt)
+    return length
+
+
+### main ###
+def main(argv=sys.argv[1:]):
+    ## verifies the IEEE 1619 test vectors, then measures the throughput of
+    ## the image mode per number of workers
+    vectors = [
+        ## key1 || key2, sector, plaintext, ciphertext
+        ("00000000000000000000000000000000" "00000000000000000000000000000000", 0,
+         "00" * 32, "917cf69ebd68b2ec9b9fe9a3eadda692cd43d2f59598ed858c02c2652fbf922e"),
+        ("11111111111111111111111111111111" "22222222222222222222222222222222", 0x3333333333,
+         "44" * 32, "c454185e6a16936e39334038acef838bfb186fff7480adc4289382ecd6d394f0"),
+        ("fffefdfcfbfaf9f8f7f6f5f4f3f2f1f0" "22222222222222222222222222222222", 0x3333333333,
+         "44" * 32, "af85336b597afc1a900b2eb21ec949d292df4c047e0b21532186a5971a227a89"),
+        ("27182818284590452353602874713526" "31415926535897932384626433832795", 0,
+         "000102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f",
+         "27a7479befa1d476489f308cd4cfa6e2a96e4bbe3208ff25287dd3819616e89c"),
+        ## ciphertext stealing, 17 to 20 bytes; the standard lists the sector
+        ## number as little endian bytes, 9a78563412
+        ("fffefdfcfbfaf9f8f7f6f5f4f3f2f1f0" "bfbebdbcbbbab9b8b7b6b5b4b3b2b1b0", 0x123456789a,
+         "000102030405060708090a0b0c0d0e0f10", "6c1625db4671522d3d7599601de7ca09ed"),
+        ("fffefdfcfbfaf9f8f7f6f5f4f3f2f1f0" "bfbebdbcbbbab9b8b7b6b5b4b3b2b1b0", 0x123456789a,
+         "000102030405060708090a0b0c0d0e0f1011", "d069444b7a7e0cab09e24447d24deb1fedbf"),
+        ("fffefdfcfbfaf9f8f7f6f5f4f3f2f1f0" "bfbebdbcbbbab9b8b7b6b5b4b3b2b1b0", 0x123456789a,
+         "000102030405060708090a0b0c0d0e0f101112", "e5df1351c0544ba1350b3363cd8ef4beedbf9d"),
+        ("fffefdfcfbfaf9f8f7f6f5f4f3f2f1f0" "bfbebdbcbbbab9b8b7b6b5b4b3b2b1b0", 0x123456789a,
+         "000102030405060708090a0b0c0d0e0f10111213", "9d84c813f719aa2c7be3f66171c7c5c2edbf9dac"),
+    ]
+    for key, sector_no, plaintext, ciphertext in vectors:
+        xts = XTS(int(key, 16), 128)
+        res = xts.encrypt_sector(bytes.fromhex(plaintext), sector_no)
+        if res.hex() != ciphertext: die(f"FAILED: XTS vector, sector {sector_no:x}, got {res.hex()}")
+        if xts.decrypt_sector(res, sector_no).hex() != plaintext: die(f"FAILED: XTS decryption, sector {sector_no:x}")
+    print(f"{len(vectors)} IEEE 1619 vectors ok")
+
+    ## image mode
+    size = 4 * 1024 * 1024
+    if len(argv) > 0: size = int(argv[0]) * 1024 * 1024
+    inputkey = 0x2718281828459045235360287471352631415926535897932384626433832795
+    xts = XTS(inputkey, 128)
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmpdir:
+        image = os.path.join(tmpdir, "image")
+        encrypted = os.path.join(tmpdir, "image.xts")
+        decrypted = os.path.join(tmpdir, "image.dec")
+        with open(image, "wb") as fd: fd.write(os.urandom(size))
+
+        ncores = os.cpu_count()
+        print(f"{size // (1024*1024)} MB image, {ncores} cores, {'numpy' if HAVE_NUMPY else 'T-table'} engine")
+        print("workers\ttime [s]\tMB/s")
+        for workers in sorted(set([1, 2, 4, ncores])):
+            start = time.perf_counter()
+            xts.encrypt_image(image, encrypted, workers)
+            elapsed = time.perf_counter() - start
+            print(f"{workers}\t{elapsed:.3f}\t\t{size / (1024*1024) / elapsed:.2f}")
+        xts.decrypt_image(encrypted, decrypted)
+        with open(image, "rb") as fd1, open(decrypted, "rb") as fd2:
+            if fd1.read() != fd2.read(): die("FAILED: image round trip")
+        ## random access, a single sector of the image
+        with open(image, "rb") as fd1, open(encrypted, "rb") as fd2:
+            fd1.seek(5 * SECTORSIZE)
+            fd2.seek(5 * SECTORSIZE)
+            if xts.decrypt_sector(fd2.read(SECTORSIZE), 5) != fd1.read(SECTORSIZE): die("FAILED: sector 5")
+
+### start ###
+if __name__ == '__main__':
+    main()
+    print("READY.")
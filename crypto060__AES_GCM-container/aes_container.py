@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# IMPORTANT: this implementation is meant as an educational demonstration only
+"""
+@author: Lothar Rubusch
+@email: L.Rubusch@gmx.ch
+@license: GPLv3
+
+AES (american encryption standard)
+128-bit block size
+key lengths of 128 bit, 192 bit or 256 bit
+
+
+chunked AES-GCM container
+
+the mode scripts encrypt a message as a whole, thus a large file can only be
+decrypted, and its tag only be verified, from the beginning to the end; here
+the data is split into chunks of fixed size, each encrypted by GCM on its
+own, with its own nonce and tag, and an index of the chunks is appended
+
+   +--------+---------+-----+---------+-----+-----+---------+-------+---------+
+   | header | chunk 0 | tag | chunk 1 | tag | ... | index   | count | tag     |
+   |        | y[0]    | 0   | y[1]    | 1   |     | offsets | size  | (index) |
+   +--------+---------+-----+---------+-----+-----+---------+-------+---------+
+
+ header   magic "AESGCMC1" (8) | chunk size (4) | tag length (1) | '0's (3)
+          | salt (8), all numbers big endian
+ chunk i  GCM of the plaintext bytes [i * chunksize, (i+1) * chunksize), the
+          last chunk may be shorter; followed by its tag
+ index    the file offset of each chunk (8 each), the number of chunks (8),
+          the length of the plaintext (8) and a GMAC tag of the index (16)
+
+ * the nonce of chunk i is salt || i (32 bit), a fresh salt per container
+   keeps the nonces unique under the same key; the index takes the nonce
+   salt || 0xffffffff
+ * the AAD of chunk i is header || i (64 bit) || 1 if it is the last chunk,
+   else 0; thus a chunk moved to another position, into another container,
+   or the container cut after a chunk, fails to verify
+ * the index is authenticated as AAD of a GCM with empty plaintext, its tag
+   is verified when a container is opened
+ * any chunk can be decrypted and verified on its own: random access to a
+   byte range decrypts only the chunks covering it, and whole containers
+   are encrypted and decrypted by worker processes, each taking a run of
+   chunks of the memory mapped files
+ * a container failing to verify, tampered, truncated or with chunks
+   dropped or reordered, raises AuthenticationError, a ValueError; a
+   decrypted file appears only once all of its chunks were verified
+
+
+sources
+http://csrc.nist.gov/publications/nistpubs/800-38D/SP-800-38D.pdf
+"""
+
+import sys, os, time, mmap, hmac, importlib, tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+## the AES core, shared by the AES scripts, and the GCM mode
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "crypto041__AES-basic"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "crypto057__AES_GCM-mode_TODO"))
+from aes_core import die
+## the name of the GCM script is no identifier
+aes_gcm = importlib.import_module("aes-gcm")
+AuthenticationError = aes_gcm.AuthenticationError
+
+CONTAINER_MAGIC = b"AESGCMC1"
+
+## plaintext bytes per chunk
+CONTAINER_CHUNKSIZE = 64 * 1024
+
+## size of the header and of the fixed end of the index, in bytes
+CONTAINER_HEADERSIZE = 24
+CONTAINER_TRAILERSIZE = 32
+
+## the chunk number is 32 bit of the nonce, the last number is the index's
+CONTAINER_MAXCHUNKS = 0xffffffff
+
+## chunks per task of the worker processes
+CHUNKS_PER_TASK = 64
+
+
+class Container:
+    def __init__(self, inputkey, keylength, chunksize=CONTAINER_CHUNKSIZE, taglength=aes_gcm.GCM_TAGLENGTH):
+        ## params:
+        ## inputkey = the key as hex number
+        ## keylength = 128, 192 or 256 bit
+        ## chunksize = plaintext bytes per chunk
+        ## taglength = length of the chunk tags in bytes
+        if not 0 < chunksize < (1 <<32): die("invalid chunk size")
+        if taglength not in aes_gcm.GCM_TAGLENGTHS: die(f"invalid tag length {taglength}")
+        self._inputkey = inputkey
+        self._keylength = keylength
+        self._chunksize = chunksize
+        self._taglength = taglength
+        self._aes = aes_gcm.AES(inputkey, keylength)
+
+    ## layout
+
+    def _header(self, salt):
+        if 8 != len(salt): die("the salt has 8 bytes")
+        return CONTAINER_MAGIC + self._chunksize.to_bytes(4, "big") + bytes((self._taglength,)) + bytes(3) + bytes(salt)
+
+    def _nchunks(self, length):
+        return (length + self._chunksize - 1) // self._chunksize
+
+    def _chunk_offset(self, idx):
+        ## the file offset of chunk idx, all chunks but the last are full
+        return CONTAINER_HEADERSIZE + idx * (self._chunksize + self._taglength)
+
+    def _chunk_length(self, idx, length):
+        ## the plaintext length of chunk idx
+        return min(self._chunksize, length - idx * self._chunksize)
+
+    def _nonce(self, header, idx):
+        ## salt || idx
+        return header[-8:] + idx.to_bytes(4, "big")
+
+    def _aad(self, header, idx, islast):
+        return header + idx.to_bytes(8, "big") + bytes((1 if islast else 0,))
+
+    def _index(self, header, offsets, length):
+        ## the index, closed by the GMAC tag over header and index
+        index = b"".join(offset.to_bytes(8, "big") for offset in offsets)
+        index += len(offsets).to_bytes(8, "big") + length.to_bytes(8, "big")
+        ciphertext, tag = self._aes.encrypt_gcm(b"", self._nonce(header, CONTAINER_MAXCHUNKS), header + index)
+        return index + tag
+
+    ## chunks
+
+    def encrypt_chunk(self, data, header, idx, islast):
+        ## params:
+        ## data = the plaintext of the chunk
+        ## header = the header of the container
+        ## idx = the number of the chunk
+        ## islast = the chunk is the last one of the container
+        ##
+        ## returns the ciphertext of the chunk followed by its tag
+        ciphertext, tag = self._aes.encrypt_gcm(bytes(data), self._nonce(header, idx), self._aad(header, idx, islast), self._taglength)
+        return ciphertext + tag
+
+    def decrypt_chunk(self, data, header, idx, islast):
+        ## params:
+        ## data = the ciphertext of the chunk followed by its tag
+        ##
+        ## returns the plaintext of the chunk, only if the tag matches, else
+        ## AuthenticationError is raised
+        nbytes = len(data) - self._taglength
+        if 0 > nbytes: raise AuthenticationError("chunk shorter than its tag")
+        return self._aes.decrypt_gcm(bytes(data[:nbytes]), self._nonce(header, idx), bytes(data[nbytes:]), self._aad(header, idx, islast))
+
+    ## files
+
+    def writer(self, fd, salt=None):
+        ## returns a ContainerWriter, a container written as a stream to the
+        ## writable file object fd
+        return ContainerWriter(self, fd, salt)
+
+    def open(self, path):
+        ## returns a ContainerReader of the container file path, of any chunk
+        ## size and tag length
+        return ContainerReader(self, path)
+
+    def encrypt_file(self, inpath, outpath, workers=None, salt=None):
+        ## encrypts the file inpath into the container outpath, by worker
+        ## processes which memory map both files; since all chunks but the
+        ## last are full, their offsets are known in advance
+        ##
+        ## params:
+        ## workers = number of worker processes, by default one per core
+        ## salt = the 8 bytes salt of the nonces, random by default
+        length = os.path.getsize(inpath)
+        nchunks = self._nchunks(length)
+        if CONTAINER_MAXCHUNKS <= nchunks: die("too many chunks, increase the chunk size")
+        header = self._header(salt if salt is not None else os.urandom(8))
+        end = CONTAINER_HEADERSIZE + length + nchunks * self._taglength
+        with open(outpath, "wb") as fd:
+            fd.write(header)
+            fd.truncate(end)
+        if 0 < nchunks:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init,
+                                     initargs=(self._inputkey, self._keylength, self._chunksize, self._taglength)) as executor:
+                futures = [executor.submit(_encrypt_chunks, inpath, outpath, header, first, min(CHUNKS_PER_TASK, nchunks - first), length)
+                           for first in range(0, nchunks, CHUNKS_PER_TASK)]
+                for future in futures: future.result()
+        with open(outpath, "r+b") as fd:
+            fd.seek(end)
+            fd.write(self._index(header, [self._chunk_offset(idx) for idx in range(nchunks)], length))
+
+    def decrypt_file(self, inpath, outpath, workers=None):
+        ## verifies and decrypts the container inpath into outpath, by worker
+        ## processes, see ContainerReader.decrypt_file()
+        with self.open(inpath) as reader:
+            reader.decrypt_file(outpath, workers)
+
+
+class ContainerWriter:
+    ## writes a container as a stream, chunk by chunk; the last chunk is
+    ## flagged in its AAD, thus a full chunk is held back until more data
+    ## follows, or the writer is closed
+    def __init__(self, container, fd, salt=None):
+        ## params:
+        ## container = the Container, holding key and layout
+        ## fd = writable binary file object
+        ## salt = the 8 bytes salt of the nonces, random by default
+        self._container = container
+        self._fd = fd
+        self._header = container._header(salt if salt is not None else os.urandom(8))
+        self._offsets = []
+        self._offset = len(self._header)
+        self._length = 0
+        self._buffer = bytearray()
+        self._closed = False
+        fd.write(self._header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, data):
+        ## params:
+        ## data = the next bytes of the plaintext
+        if self._closed: die("container writer is closed")
+        self._buffer += data
+        chunksize = self._container._chunksize
+        pos = 0
+        while len(self._buffer) - pos > chunksize:
+            self._write_chunk(self._buffer[pos:pos+chunksize], False)
+            pos += chunksize
+        del self._buffer[:pos]
+
+    def close(self):
+        ## writes the last chunk and the index; the file object stays open
+        if self._closed: return
+        if 0 < len(self._buffer): self._write_chunk(self._buffer, True)
+        self._buffer = bytearray()
+        self._fd.write(self._container._index(self._header, self._offsets, self._length))
+        self._closed = True
+
+    def _write_chunk(self, data, islast):
+        idx = len(self._offsets)
+        if CONTAINER_MAXCHUNKS <= idx: die("too many chunks, increase the chunk size")
+        out = self._container.encrypt_chunk(data, self._header, idx, islast)
+        self._fd.write(out)
+        self._offsets.append(self._offset)
+        self._offset += len(out)
+        self._length += len(data)
+
+
+class ContainerReader:
+    ## random access to a container file, memory mapped; the index is
+    ## verified when opened, a chunk when it is read
+    def __init__(self, container, path):
+        ## params:
+        ## container = the Container, holding the key; chunk size and tag
+        ##             length are taken from the header of the file
+        ## path = the container file
+        ##
+        ## raises AuthenticationError, if the file is no container of this
+        ## key or was modified
+        self._path = path
+        self._fd = open(path, "rb")
+        self._buf = None
+        try:
+            self._open(container)
+        except:
+            self.close()
+            raise
+
+    def _open(self, container):
+        ## maps the file, reads the header and verifies the index
+        size = os.fstat(self._fd.fileno()).st_size
+        if CONTAINER_HEADERSIZE + CONTAINER_TRAILERSIZE > size: raise AuthenticationError("not a container, too short")
+        self._buf = mmap.mmap(self._fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+        ## header, the layout of the file replaces the one of container
+        header = bytes(self._buf[:CONTAINER_HEADERSIZE])
+        if CONTAINER_MAGIC != header[:8]: raise AuthenticationError("not a container")
+        chunksize = int.from_bytes(header[8:12], "big")
+        taglength = header[12]
+        if 0 == chunksize or taglength not in aes_gcm.GCM_TAGLENGTHS or bytes(3) != header[13:16]: raise AuthenticationError("corrupt container header")
+        if (chunksize, taglength) != (container._chunksize, container._taglength):
+            container = Container(container._inputkey, container._keylength, chunksize, taglength)
+        self._container = container
+        self._header = header
+
+        ## index
+        trailer = self._buf[size - CONTAINER_TRAILERSIZE:]
+        self.nchunks = int.from_bytes(trailer[:8], "big")
+        self.length = int.from_bytes(trailer[8:16], "big")
+        start = size - CONTAINER_TRAILERSIZE - 8 * self.nchunks
+        if CONTAINER_HEADERSIZE > start or self.nchunks != container._nchunks(self.length): raise AuthenticationError("corrupt container index")
+        self._offsets = [int.from_bytes(self._buf[pos:pos+8], "big") for pos in range(start, start + 8 * self.nchunks, 8)]
+        expected = container._index(header, self._offsets, self.length)
+        if not hmac.compare_digest(expected, bytes(self._buf[start:])): raise AuthenticationError("the container index does not match")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.length
+
+    def read_chunk(self, idx):
+        ## returns the verified plaintext of chunk idx, see decrypt_chunk()
+        if not 0 <= idx < self.nchunks: die(f"no chunk {idx}")
+        offset = self._offsets[idx]
+        nbytes = self._container._chunk_length(idx, self.length) + self._container._taglength
+        return self._container.decrypt_chunk(self._buf[offset:offset+nbytes], self._header, idx, idx == self.nchunks - 1)
+
+    def read_range(self, offset, size):
+        ## returns the plaintext bytes [offset, offset+size), decrypting and
+        ## verifying only the chunks covering them
+        end = min(offset + size, self.length)
+        if 0 > offset or end <= offset: return b""
+        chunksize = self._container._chunksize
+        first = offset // chunksize
+        last = (end - 1) // chunksize
+        data = b"".join(self.read_chunk(idx) for idx in range(first, last + 1))
+        return data[offset - first * chunksize:end - first * chunksize]
+
+    def decrypt_file(self, outpath, workers=None):
+        ## verifies and decrypts all chunks into outpath, by worker processes
+        ## which memory map both files; the chunks are decrypted into a
+        ## temporary file next to outpath, renamed to outpath once all of them
+        ## were verified, else removed and AuthenticationError is raised
+        ##
+        ## params:
+        ## workers = number of worker processes, by default one per core
+        fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(outpath)), prefix=".aesc-")
+        try:
+            with os.fdopen(fd, "wb") as fd:
+                fd.truncate(self.length)
+            if 0 < self.nchunks:
+                container = self._container
+                with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init,
+                                         initargs=(container._inputkey, container._keylength, container._chunksize, container._taglength)) as executor:
+                    futures = [executor.submit(_decrypt_chunks, self._path, tmppath, self._header, first,
+                                               self._offsets[first:first+CHUNKS_PER_TASK], self.nchunks, self.length)
+                               for first in range(0, self.nchunks, CHUNKS_PER_TASK)]
+                    for future in futures: future.result()
+            os.replace(tmppath, outpath)
+        except:
+            os.unlink(tmppath)
+            raise
+
+    def close(self):
+        if self._buf is not None:
+            self._buf.close()
+            self._buf = None
+        self._fd.close()
+
+
+### worker ###
+
+## the Container of the worker process, set up once by _worker_init()
+_worker_container = None
+
+def _worker_init(inputkey, keylength, chunksize, taglength):
+    global _worker_container
+    _worker_container = Container(inputkey, keylength, chunksize, taglength)
+
+def _encrypt_chunks(inpath, outpath, header, first, count, length):
+    ## runs in a worker: encrypts the chunks first .. first+count-1
+    container = _worker_container
+    nchunks = container._nchunks(length)
+    with open(inpath, "rb") as infd, open(outpath, "r+b") as outfd:
+        with mmap.mmap(infd.fileno(), 0, access=mmap.ACCESS_READ) as inbuf, \
+             mmap.mmap(outfd.fileno(), 0, access=mmap.ACCESS_WRITE) as outbuf:
+            for idx in range(first, first + count):
+                start = idx * container._chunksize
+                out = container.encrypt_chunk(inbuf[start:start+container._chunk_length(idx, length)], header, idx, idx == nchunks - 1)
+                offset = container._chunk_offset(idx)
+                outbuf[offset:offset+len(out)] = out
+    return count
+
+def _decrypt_chunks(inpath, outpath, header, first, offsets, nchunks, length):
+    ## runs in a worker: verifies and decrypts the chunks at offsets, the
+    ## first of them is chunk first
+    container = _worker_container
+    with open(inpath, "rb") as infd, open(outpath, "r+b") as outfd:
+        with mmap.mmap(infd.fileno(), 0, access=mmap.ACCESS_READ) as inbuf, \
+             mmap.mmap(outfd.fileno(), 0, access=mmap.ACCESS_WRITE) as outbuf:
+            for idx, offset in enumerate(offsets, first):
+                nbytes = container._chunk_length(idx, length)
+                data = container.decrypt_chunk(inbuf[offset:offset+nbytes+container._taglength], header, idx, idx == nchunks - 1)
+                start = idx * container._chunksize
+                outbuf[start:start+nbytes] = data
+    return len(offsets)
+
+
+### main ###
+def main(argv=sys.argv[1:]):
+    ## writes a container as a stream and from a file, reads chunks and byte
+    ## ranges at random, and measures the throughput per number of workers
+    size = 1024 * 1024
+    if len(argv) > 0: size = int(argv[0]) * 1024 * 1024
+    inputkey = 0x000102030405060708090a0b0c0d0e0f
+    container = Container(inputkey, 128, chunksize=16 * 1024)
+    salt = bytes.fromhex("cafebabefacedbad")
+    import tempfile, random
+    with tempfile.TemporaryDirectory() as tmpdir:
+        plainpath = os.path.join(tmpdir, "data")
+        encpath = os.path.join(tmpdir, "data.aesc")
+        streampath = os.path.join(tmpdir, "data.stream.aesc")
+        decpath = os.path.join(tmpdir, "data.dec")
+        plaintext = os.urandom(size + 1234)
+        with open(plainpath, "wb") as fd: fd.write(plaintext)
+
+        ## the stream writer and the parallel encryption give the same
+        ## container for the same salt
+        with open(streampath, "wb") as fd, container.writer(fd, salt) as writer:
+            for idx in range(0, len(plaintext), 10000): writer.write(plaintext[idx:idx+10000])
+
+        ncores = os.cpu_count()
+        print(f"{len(plaintext)} bytes, {container._nchunks(len(plaintext))} chunks, {ncores} cores")
+        print("workers\tencrypt [MB/s]\tdecrypt [MB/s]")
+        for workers in sorted(set([1, 2, ncores])):
+            start = time.perf_counter()
+            container.encrypt_file(plainpath, encpath, workers, salt)
+            elapsed_encrypt = time.perf_counter() - start
+            start = time.perf_counter()
+            container.decrypt_file(encpath, decpath, workers)
+            elapsed_decrypt = time.perf_counter() - start
+            with open(decpath, "rb") as fd:
+                if fd.read() != plaintext: die(f"FAILED: container round trip, {workers} workers")
+            print(f"{workers}\t{len(plaintext) / (1024*1024) / elapsed_encrypt:.3f}\t\t{len(plaintext) / (1024*1024) / elapsed_decrypt:.3f}")
+        with open(encpath, "rb") as fd1, open(streampath, "rb") as fd2:
+            if fd1.read() != fd2.read(): die("FAILED: stream and file container differ")
+
+        ## random access, each read decrypts only the chunks covering it; the
+        ## layout comes from the header, thus the key alone opens the file
+        with Container(inputkey, 128).open(encpath) as reader:
+            for idx in range(100):
+                offset = random.randrange(len(plaintext))
+                nbytes = random.randrange(1, 40000)
+                if reader.read_range(offset, nbytes) != plaintext[offset:offset+nbytes]: die(f"FAILED: range {offset}, {nbytes}")
+            if reader.read_chunk(reader.nchunks - 1) != plaintext[(reader.nchunks - 1) * 16 * 1024:]: die("FAILED: last chunk")
+        print("random access ok")
+
+        ## tampering, each modified container is rejected when opened or when
+        ## decrypted, and leaves no decrypted file behind
+        small = Container(inputkey, 128, chunksize=1024)
+        smallpath = os.path.join(tmpdir, "small.aesc")
+        tamperpath = os.path.join(tmpdir, "tampered.aesc")
+        with open(smallpath, "wb") as fd, small.writer(fd, salt) as writer:
+            writer.write(plaintext[:3500])
+        with open(smallpath, "rb") as fd: good = fd.read()
+        chunk = 1024 + 16
+        def flip(data, pos):
+            return data[:pos] + bytes((data[pos] ^ 0x01,)) + data[pos+1:]
+        tampered = {
+            "chunk": flip(good, CONTAINER_HEADERSIZE + chunk + 100),
+            "tag": flip(good, CONTAINER_HEADERSIZE + chunk - 1),
+            "index": flip(good, len(good) - CONTAINER_TRAILERSIZE - 8 * 4 + 7),
+            "index tag": flip(good, len(good) - 1),
+            "header magic": flip(good, 0),
+            "header chunk size": flip(good, 10),
+            "header salt": flip(good, CONTAINER_HEADERSIZE - 1),
+            "truncated": good[:-1],
+            "truncated index": good[:CONTAINER_HEADERSIZE + 3 * chunk],
+            "dropped chunk": good[:CONTAINER_HEADERSIZE + chunk] + good[CONTAINER_HEADERSIZE + 2 * chunk:],
+            "reordered chunks": good[:CONTAINER_HEADERSIZE] + good[CONTAINER_HEADERSIZE + chunk:CONTAINER_HEADERSIZE + 2 * chunk]
+                                + good[CONTAINER_HEADERSIZE:CONTAINER_HEADERSIZE + chunk] + good[CONTAINER_HEADERSIZE + 2 * chunk:],
+        }
+        for name, data in tampered.items():
+            with open(tamperpath, "wb") as fd: fd.write(data)
+            if os.path.exists(decpath): os.unlink(decpath)
+            try:
+                Container(inputkey, 128).decrypt_file(tamperpath, decpath, 1)
+                die(f"FAILED: tampered container accepted, {name}")
+            except AuthenticationError:
+                pass
+            if os.path.exists(decpath): die(f"FAILED: tampered container left a decrypted file, {name}")
+        small.decrypt_file(smallpath, decpath, 1)
+        with open(decpath, "rb") as fd:
+            if fd.read() != plaintext[:3500]: die("FAILED: small container round trip")
+        if sorted(os.listdir(tmpdir)) != sorted(["data", "data.aesc", "data.stream.aesc", "data.dec", "small.aesc", "tampered.aesc"]):
+            die("FAILED: temporary files left behind")
+        print(f"{len(tampered)} tampered containers rejected")
+
+### start ###
+if __name__ == '__main__':
+    main()
+    print("READY.")